@@ -0,0 +1,222 @@
+# Microbenchmarks voor de pure functies die op elk frame draaien.
+# Meet ops/sec en piek-allocatie per call, en faalt bij een regressie t.o.v. de baseline.
+# Gebruik: python bench/hotpath.py --save-baseline   (eenmalig)
+#          python bench/hotpath.py --threshold 0.25
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+import bot
+
+BASELINE_FILE = os.path.join(REPO_DIR, "bench", "hotpath_baseline.json")
+
+random.seed(24)
+
+
+# ATIS corpora
+ATIS_TYPICAL = [
+    "Rockford Information Alpha",
+    "Time 1420Z",
+    "DEP RWY 25L ARR RWY 25C",
+    "Wind 250 at 12, visibility 10km",
+    "Temperature 18, dewpoint 11, QNH 1013",
+    "Advise on initial contact you have information Alpha"
+]
+ATIS_MULTI_RUNWAY = [
+    "Tokyo Information Kilo",
+    "dep rwy 34l/34r, Arr Rwy 7",
+    "Expect ILS approach"
+]
+ATIS_IN_USE = ["Perth Information Echo", "RWY 11 IN USE", "Transition level FL080"]
+ATIS_NO_RUNWAY = ["Larnaca Information Bravo", "Wind calm", "QNH 1008"] * 5
+ATIS_LONG = (
+    [f"Notam {i}: taxiway {chr(65 + i % 26)} closed between stands {i} and {i + 3}" for i in range(400)]
+    + ["ARR RWY 24", "DEP RWY 06"]
+)
+ATIS_LONG_LINE = ["x" * 20000 + " RWY " + "y" * 20000, "DEP RWY 25R", "ARR RWY 25L"]
+
+# Flight plan payloads
+FPL_KLMVA = {
+    "robloxName": "pilot123",
+    "callsign": "KLM1234",
+    "aircraft": "A320",
+    "flightrules": "IFR",
+    "departing": "IRFD",
+    "arriving": "IPPH",
+    "flightlevel": "350",
+    "route": "IRFD/25L DCT KUNAV DCT BOBUX IPPH/29 /RMK KLMVA"
+}
+FPL_OTHER = dict(FPL_KLMVA, callsign="DLH99", route="IRFD/25L DCT KUNAV IPPH/29")
+FPL_ODD_CASING = dict(FPL_KLMVA, route="  irfd/25l dct kunav ipph/29 /rmk klmva  ")
+FPL_LONG = dict(FPL_KLMVA, route=" ".join(f"WPT{i:03d}" for i in range(500)) + " /RMK KLMVA")
+
+# Matcher met veel VA's, kosten per frame mogen niet meegroeien
+MANY_TENANTS = bot.compile_tenants(
+    [{"name": f"VA{i}", "remarks": [f"VA{i:02d}"], "callsigns": [f"X{i:02d}"]} for i in range(50)]
+    + bot.VA_TENANTS
+)
+
+
+def tenant_match(name, route):
+    return lambda result: (result[0] and result[0]["name"], result[1]) == (name, route)
+
+
+# Verwachte uitkomst per case (waarde, of functie die de uitkomst controleert).
+# Snel maar fout telt als fout, ook zonder baseline.
+EXPECTED = {
+    "parse_atis/typical": ("25L", "25C"),
+    "parse_atis/multi_runway": ("34L", "07"),
+    "parse_atis/in_use": ("11", "11"),
+    "parse_atis/no_runway": (None, None),
+    "parse_atis/long": ("06", "24"),
+    "parse_atis/long_line": ("25R", "25L"),
+    "parse_atis/cached": ("25L", "25C"),
+    "extract_dep_runway": "25L",
+    "extract_arr_runway": "25C",
+    "get_route_config/hit": lambda result: bool(result) and result["command"].startswith("/createflightplan "),
+    "get_route_config/miss": lambda result: not result,
+    "build_flightplan_command": lambda result: "route:IRFD/25L DCT KUNAV DCT BOBUX IPPH/29 /RMK KLMVA" in result,
+    "route_key": "IRFD-IPPH",
+    "match_tenant/klmva": tenant_match("KLMVA", "IRFD/25L DCT KUNAV DCT BOBUX IPPH/29"),
+    "match_tenant/other": (None, None),
+    "match_tenant/odd_casing": tenant_match("KLMVA", "irfd/25l dct kunav ipph/29"),
+    "match_tenant/long": tenant_match("KLMVA", " ".join(f"WPT{i:03d}" for i in range(500))),
+    "match_tenant/50_tenants": tenant_match("KLMVA", "IRFD/25L DCT KUNAV DCT BOBUX IPPH/29"),
+    "match_tenant/50_tenants_other": (None, None),
+    "flight_plan_key": ("KLM1234", "IRFD/25L DCT KUNAV DCT BOBUX IPPH/29 /RMK KLMVA", "IRFD", "IPPH"),
+}
+
+
+def correct(name, result):
+    expected = EXPECTED[name]
+    return expected(result) if callable(expected) else result == expected
+
+
+def cases():
+    route_key = random.choice(list(bot.ROUTE_TABLE))
+
+    return {
+        "parse_atis/typical": lambda: bot.parse_atis_runways(ATIS_TYPICAL),
+        "parse_atis/multi_runway": lambda: bot.parse_atis_runways(ATIS_MULTI_RUNWAY),
+        "parse_atis/in_use": lambda: bot.parse_atis_runways(ATIS_IN_USE),
+        "parse_atis/no_runway": lambda: bot.parse_atis_runways(ATIS_NO_RUNWAY),
+        "parse_atis/long": lambda: bot.parse_atis_runways(ATIS_LONG),
+        "parse_atis/long_line": lambda: bot.parse_atis_runways(ATIS_LONG_LINE),
+        "parse_atis/cached": lambda: bot.parse_atis_cached(bot.atis_hash(ATIS_TYPICAL), ATIS_TYPICAL),
+        "extract_dep_runway": lambda: bot.extract_dep_runway_from_atis(ATIS_TYPICAL),
+        "extract_arr_runway": lambda: bot.extract_arr_runway_from_atis(ATIS_TYPICAL),
+        "get_route_config/hit": lambda: bot.get_route_config(*route_key),
+        "get_route_config/miss": lambda: bot.get_route_config("XXXX", "99", "YYYY", "01"),
+        "build_flightplan_command": lambda: bot.build_flightplan_command(
+            aircraft="A/Bxxx", departing="IRFD", dep_rwy="25L", arriving="IPPH", arr_rwy="29",
+            flightlevel="350", route="DCT KUNAV DCT BOBUX"
+        ),
+        "route_key": lambda: bot.route_key("IRFD", "IPPH"),
+        "match_tenant/klmva": lambda: bot.match_tenant(FPL_KLMVA),
+        "match_tenant/other": lambda: bot.match_tenant(FPL_OTHER),
+        "match_tenant/odd_casing": lambda: bot.match_tenant(FPL_ODD_CASING),
+        "match_tenant/long": lambda: bot.match_tenant(FPL_LONG),
+        "match_tenant/50_tenants": lambda: bot.match_tenant(FPL_KLMVA, MANY_TENANTS),
+        "match_tenant/50_tenants_other": lambda: bot.match_tenant(FPL_OTHER, MANY_TENANTS),
+        "flight_plan_key": lambda: bot.flight_plan_key(FPL_KLMVA, FPL_KLMVA["route"]),
+    }
+
+
+def measure(func, min_time):
+    # Aantal iteraties opschalen tot een run lang genoeg duurt
+    iterations = 100
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - started
+
+        if elapsed >= min_time:
+            break
+        iterations *= 2 if elapsed < min_time / 4 else 1.5
+        iterations = int(iterations)
+
+    ops = iterations / elapsed
+
+    # Piek geheugen tijdens één call
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return ops, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for bot.py hot-path functions")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    wrong = []
+
+    if not baseline and not args.save_baseline:
+        print("No baseline found, only checking results (use --save-baseline)")
+
+    print(f"{'case':32} {'ops/sec':>14} {'peak alloc/call':>16} {'vs baseline':>12}")
+
+    for name, func in cases().items():
+        if args.filter not in name:
+            continue
+
+        result = func()
+        if not correct(name, result):
+            wrong.append(name)
+            print(f"{name:32} WRONG RESULT: {result!r:.200}")
+            continue
+
+        ops, peak = measure(func, args.min_time)
+        results[name] = ops
+
+        change = ""
+        if name in baseline:
+            ratio = ops / baseline[name]
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio < 1 - args.threshold:
+                regressions.append(name)
+                change += " !"
+
+        print(f"{name:32} {ops:14,.0f} {peak:14,d} B {change:>12}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if wrong:
+        print(f"Wrong results: {', '.join(wrong)}")
+
+    if regressions:
+        print(f"Regression over {args.threshold:.0%}: {', '.join(regressions)}")
+
+    if wrong or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
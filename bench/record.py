@@ -0,0 +1,101 @@
+# 24data frames opnemen naar gzip JSONL, één regel per frame: {"ts": ..., "frame": "..."}
+# Gebruik: python bench/record.py --out recordings --rotate-mb 50
+import os
+import json
+import gzip
+import time
+import asyncio
+import argparse
+
+import websockets
+
+WSS_URL = "wss://24data.ptfs.app/wss"
+
+
+# Schrijft naar een nieuw bestand zodra het huidige te groot of te oud wordt
+class RotatingRecorder:
+    def __init__(self, directory, max_bytes, max_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.file = None
+        self.written = 0
+        self.opened = 0
+        self.frames = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def rotate(self):
+        self.close()
+
+        name = time.strftime("frames-%Y%m%d-%H%M%S.jsonl.gz")
+        path = os.path.join(self.directory, name)
+        self.file = gzip.open(path, "at", encoding="utf-8")
+        self.written = 0
+        self.opened = time.monotonic()
+        print(f"Recording to {path}")
+
+    def write(self, ts, frame):
+        if (
+            self.file is None
+            or self.written >= self.max_bytes
+            or time.monotonic() - self.opened >= self.max_seconds
+        ):
+            self.rotate()
+
+        line = json.dumps({"ts": ts, "frame": frame}) + "\n"
+        self.file.write(line)
+        self.written += len(line)
+        self.frames += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+async def record(url, recorder, duration):
+    stop_at = time.monotonic() + duration if duration else None
+
+    while stop_at is None or time.monotonic() < stop_at:
+        try:
+            async with websockets.connect(url, origin=None) as websocket:
+                print(f"Connected to {url}")
+
+                async for message in websocket:
+                    if isinstance(message, bytes):
+                        message = message.decode()
+
+                    recorder.write(time.time(), message)
+
+                    if stop_at and time.monotonic() >= stop_at:
+                        break
+
+        except Exception as e:
+            print(f"WebSocket error: {e}")
+            await asyncio.sleep(5)
+
+    print(f"Recorded {recorder.frames} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record raw 24data WebSocket frames")
+    parser.add_argument("--url", default=WSS_URL)
+    parser.add_argument("--out", default="recordings")
+    parser.add_argument("--rotate-mb", type=float, default=50, help="rotate after this many MB of raw frames")
+    parser.add_argument("--rotate-minutes", type=float, default=60)
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = forever)")
+    args = parser.parse_args()
+
+    recorder = RotatingRecorder(args.out, int(args.rotate_mb * 1024 * 1024), args.rotate_minutes * 60)
+
+    try:
+        asyncio.run(record(args.url, recorder, args.duration))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+
+
+if __name__ == "__main__":
+    main()
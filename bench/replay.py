@@ -0,0 +1,85 @@
+# Opname afspelen op een lokale websocket, als vervanger van 24data
+# Gebruik: python bench/replay.py recordings/*.jsonl.gz --speed 10   (--speed 0 = zo snel mogelijk)
+import json
+import gzip
+import time
+import asyncio
+import argparse
+
+import websockets
+
+
+def read_recording(paths):
+    for path in sorted(paths):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["ts"], entry["frame"]
+
+
+async def replay(websocket, paths, speed):
+    first_ts = None
+    started = time.monotonic()
+    frames = 0
+
+    for ts, frame in read_recording(paths):
+        if first_ts is None:
+            first_ts = ts
+
+        # Oorspronkelijke timing aanhouden, gedeeld door de speed
+        if speed > 0:
+            delay = (ts - first_ts) / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        await websocket.send(frame)
+        frames += 1
+
+    return frames
+
+
+# done: future die het aantal afgespeelde frames krijgt.
+# once: alleen de eerste verbinding krijgt de opname, een reconnect krijgt niks (benchmark)
+async def serve(paths, host, port, speed, done=None, once=False):
+    served = False
+
+    async def handler(websocket, *args):
+        nonlocal served
+
+        if once and served:
+            await websocket.close()
+            return
+
+        served = True
+        frames = await replay(websocket, paths, speed)
+        print(f"Replayed {frames} frames")
+
+        if done and not done.done():
+            done.set_result(frames)
+
+    return await websockets.serve(handler, host, port)
+
+
+async def serve_forever(paths, host, port, speed):
+    await serve(paths, host, port, speed)
+    print(f"Replaying {len(paths)} file(s) on ws://{host}:{port} at {'max' if speed <= 0 else f'{speed}x'} speed")
+    await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a frame recording on a local WebSocket")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1, help="1 = real time, N = N times faster, 0 = max")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve_forever(args.paths, args.host, args.port, args.speed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
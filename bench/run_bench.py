@@ -0,0 +1,194 @@
+# Benchmark van het ingest pad: bot.py luistert naar een afgespeelde opname,
+# Discord calls gaan naar een nep-sink met instelbare latency en 429's.
+# Gebruik: python bench/run_bench.py recordings/*.jsonl.gz --speed 0 --latency 0.15 --ratelimit-rate 0.05
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import collections
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# bot.py laadt routes.json relatief aan de working directory
+os.chdir(REPO_DIR)
+
+import bot
+import replay
+
+
+# Nep Discord: elke call wacht de latency, soms eerst een 429 retry (zoals discord.py dat doet)
+class FakeSink:
+    def __init__(self, latency, ratelimit_rate, retry_after):
+        self.latency = latency
+        self.ratelimit_rate = ratelimit_rate
+        self.retry_after = retry_after
+        self.requests = collections.Counter()
+        self.ratelimits = 0
+        self.next_id = 1
+
+    async def request(self, method):
+        self.requests[method] += 1
+
+        if random.random() < self.ratelimit_rate:
+            self.ratelimits += 1
+            bot.RATELIMIT_WAIT_SECONDS.observe(self.retry_after)
+            await asyncio.sleep(self.retry_after)
+
+        await asyncio.sleep(self.latency)
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+
+class FakeMessage:
+    def __init__(self, sink, message_id):
+        self.sink = sink
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        await self.sink.request("edit")
+        return self
+
+    async def delete(self):
+        await self.sink.request("delete")
+
+
+class FakeChannel:
+    def __init__(self, sink):
+        self.sink = sink
+        self.id = 1
+
+    async def send(self, **kwargs):
+        await self.sink.request("send")
+        return FakeMessage(self.sink, self.sink.new_id())
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self.sink, message_id)
+
+    async def delete_messages(self, messages):
+        await self.sink.request("delete_messages")
+
+
+class FakeClient:
+    def __init__(self, channel):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+
+    async def wait_until_ready(self):
+        pass
+
+    def is_closed(self):
+        return False
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def wait_until_idle(expected_frames):
+    # Alle frames gelezen en twee keer achter elkaar niks meer te doen -> klaar
+    idle = 0
+    while idle < 2:
+        await asyncio.sleep(0.1)
+        busy = (
+            sum(bot.frames_parsed.values()) + sum(bot.frames_skipped.values()) < expected_frames
+            or bot.event_queue.depth()
+            or bot.pending_route_updates
+            or bot.fpl_batch_tasks
+            or any(bot.fpl_pending.values())
+            or any(lane.unfinished for lane in bot.send_lanes.values())
+        )
+        idle = 0 if busy else idle + 1
+
+
+async def run(args):
+    sink = FakeSink(args.latency, args.ratelimit_rate, args.retry_after)
+    bot.client = FakeClient(FakeChannel(sink))
+    bot.WSS_URL = f"ws://127.0.0.1:{args.port}"
+    bot.ROUTE_COALESCE_WINDOW = args.route_window
+    bot.FPL_BATCH_WINDOW = args.fpl_window
+    bot.route_messages.clear()
+    bot.route_hashes_seeded.set()
+
+    # Geen echte REST calls tijdens de benchmark
+    async def no_resync(force=False):
+        pass
+    bot.resync_atis = no_resync
+
+    # Ruwe latencies bijhouden voor percentielen
+    samples = collections.defaultdict(list)
+    observe = bot.END_TO_END_SECONDS.observe
+
+    def record_end_to_end(value, **labels):
+        samples[labels.get("event")].append(value)
+        observe(value, **labels)
+    bot.END_TO_END_SECONDS.observe = record_end_to_end
+
+    # Eén keer afspelen: een reconnect van de listener mag de opname niet opnieuw krijgen
+    done = asyncio.get_running_loop().create_future()
+    server = await replay.serve(args.paths, "127.0.0.1", args.port, args.speed, done, once=True)
+
+    tasks = [asyncio.create_task(bot.event_worker()) for _ in range(args.workers)]
+    tasks.append(asyncio.create_task(bot.websocket_listener()))
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+
+    replayed_frames = await done
+    replayed = time.perf_counter() - started
+    await wait_until_idle(replayed_frames)
+    total = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    for task in tasks:
+        task.cancel()
+    server.close()
+
+    frames = sum(bot.frames_parsed.values()) + sum(bot.frames_skipped.values())
+
+    print()
+    print(f"Frames:           {frames} ({dict(bot.frames_parsed)} parsed)")
+    print(f"Replay time:      {replayed:.2f}s, drained after {total:.2f}s")
+    print(f"Throughput:       {frames / total:.0f} frames/s, CPU {cpu / max(frames, 1) * 1e6:.1f}µs per frame")
+    print(f"Discord requests: {dict(sink.requests)}, 429s {sink.ratelimits}")
+    print(f"Dropped events:   {bot.event_queue.dropped} (queue), {bot.fpl_duplicates} duplicate flight plans")
+
+    for event, values in sorted(samples.items()):
+        values.sort()
+        print(
+            f"End-to-end {event}: n={len(values)} "
+            f"p50={percentile(values, 0.5) * 1000:.1f}ms "
+            f"p90={percentile(values, 0.9) * 1000:.1f}ms "
+            f"p99={percentile(values, 0.99) * 1000:.1f}ms "
+            f"max={values[-1] * 1000:.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot.py's ingest path against a replayed recording")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, N = N times faster, 0 = max")
+    parser.add_argument("--workers", type=int, default=bot.EVENT_WORKERS)
+    parser.add_argument("--latency", type=float, default=0.1, help="fake Discord latency in seconds")
+    parser.add_argument("--ratelimit-rate", type=float, default=0.0, help="fraction of Discord calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--route-window", type=float, default=bot.ROUTE_COALESCE_WINDOW)
+    parser.add_argument("--fpl-window", type=float, default=bot.FPL_BATCH_WINDOW)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,36 @@
 # import packages
+import time
+
+# Voor de startup tijd (process start -> eerste route gepost)
+PROCESS_START = time.monotonic()
+
+import os
 import json
 import asyncio
+import collections
 import re
+import hashlib
+import datetime
+import random
+import bisect
+import logging
 
 import discord
 import aiohttp
 import websockets
 from discord import app_commands
+from aiohttp import web
+
+from route_engine import RouteEngine
+from traffic import TrafficStore
+from state_store import StateStore
+
+# Snellere JSON parser als die geïnstalleerd is
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # env variabelen
 TOKEN = ""
@@ -17,8 +41,107 @@ SERVER_ID = 1
 MASTER_ROLE = 1
 
 WSS_URL = "wss://24data.ptfs.app/wss"
+ATIS_URL = "https://24data.ptfs.app/atis"
 BOT_ACTIVE = True
 
+# Lokale ingest hub (hub.py) i.p.v. een eigen 24data verbinding, bv. "ws://127.0.0.1:8765".
+# De hub stuurt de ATIS snapshot bij het verbinden, dus dan geen REST calls vanuit de bot.
+INGEST_HUB_URL = ""
+
+# Virtual airlines die deze bot bedient. Een flight plan hoort bij een VA als de route
+# eindigt op "/RMK <remark>" of de callsign met een van de prefixes begint.
+# display = naam in de embeds, channel None = alle "fpl" abonnementen (met hun eigen role), role None = ROLE_ID
+VA_TENANTS = [
+    {"name": "KLMVA", "display": "KLM VA", "remarks": ["KLMVA"], "callsigns": [], "channel": None, "role": None},
+]
+
+# Abonnementen: welke kanalen (ook in partner servers) welke feed krijgen.
+# "route" = route embeds + traffic status, "fpl" = flight plans van VA's zonder eigen kanaal
+SUBSCRIPTIONS = [
+    {"guild": SERVER_ID, "channel": CHANNEL_ID_ROUTE, "feed": "route"},
+    {"guild": SERVER_ID, "channel": CHANNEL_ID_FPL, "feed": "fpl", "role": ROLE_ID},
+]
+
+# Eigen send lane per kanaal: volgorde blijft, max SEND_LANE_RATE berichten per SEND_LANE_PER seconden
+SEND_LANE_RATE = 5
+SEND_LANE_PER = 5
+
+# HTTP: één gedeelde sessie, ATIS periodiek via REST controleren
+HTTP_MAX_CONNECTIONS = 4
+HTTP_TIMEOUT = 15
+ATIS_RECONCILE_INTERVAL = 60
+
+# Reconnect: exponential backoff met jitter
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+# Event queue tussen websocket en Discord
+EVENT_QUEUE_SIZE = 500
+EVENT_WORKERS = 4
+# "block" = websocket wacht bij volle queue
+# "drop_atis" = oudste ATIS weggooien, flight plans worden nooit weggegooid
+EVENT_QUEUE_POLICY = "drop_atis"
+
+# Alleen deze events worden volledig geparsed, de rest wordt meteen overgeslagen
+HANDLED_EVENTS = {"FLIGHT_PLAN", "EVENT_FLIGHT_PLAN", "ATIS", "ATIS_SNAPSHOT"}
+
+# Live KLM verkeer uit de aircraft data frames (alleen geparsed als er KLMVA piloten zijn)
+TRAFFIC_EVENTS = {"ACFT_DATA", "EVENT_ACFT_DATA"}
+TRAFFIC_CAPACITY = 256
+TRAFFIC_GRID_SIZE = 5000
+TRAFFIC_TIMEOUT = 600
+TRAFFIC_PILOT_TTL = 3 * 3600
+TRAFFIC_NEAR_RADIUS = 10000
+TRAFFIC_EMBED_MAX = 20
+# Status embed wordt hooguit één keer per interval ge-edit
+TRAFFIC_EMBED_INTERVAL = 30
+# Airport ICAO -> (x, y) in 24data kaart coördinaten, voor "near airport".
+# Leeg = uit: de traffic embed laat dan geen "near <airport>" zien tot dit ingevuld is.
+AIRPORT_POSITIONS = {}
+FRAME_STATS_INTERVAL = 300
+
+# Runways, route berichten en flight plans bewaren tussen restarts (SQLite, WAL)
+STATE_DB_FILE = "bot_state.db"
+STATE_FLUSH_INTERVAL = 1.0
+# Oude opslag van de route bericht ID's, wordt eenmalig overgenomen
+ROUTE_MESSAGES_FILE = "route_messages.json"
+
+# Hash van de slash command definities, tree.sync alleen als die veranderd is
+COMMAND_HASH_FILE = "command_hash.txt"
+
+# routes.json wordt opnieuw geladen als het bestand verandert
+ROUTES_FILE = "routes.json"
+ROUTES_RELOAD_INTERVAL = 10
+
+# Waypoint/airway graaf voor routes die niet in routes.json staan (optioneel)
+AIRWAYS_FILE = "airways.json"
+
+# ATIS wijzigingen per route samenvoegen: na dit aantal seconden alleen de laatste stand posten
+ROUTE_COALESCE_WINDOW = 5
+
+# KLMVA flight plans bundelen: eerste meteen, daarna max FPL_BATCH_SIZE embeds per bericht per window
+FPL_BATCH_WINDOW = 10
+FPL_BATCH_SIZE = 10  # Discord staat max 10 embeds per bericht toe
+
+# Dubbele flight plans (zelfde callsign/route/dep/arr) binnen de TTL niet opnieuw posten
+FPL_DEDUP_TTL = 1800
+FPL_DEDUP_MAX = 2000
+# "suppress" = duplicaat negeren, "edit" = eerdere aankondiging bijwerken
+FPL_DEDUP_MODE = "suppress"
+
+# /fplstats: rolling window in dagen en aantal entries per top lijst
+FPL_STATS_DAYS = 30
+FPL_STATS_TOP = 5
+
+# Kanaal leegmaken: bulk delete werkt alleen voor berichten jonger dan 14 dagen
+PURGE_BATCH_SIZE = 100
+PURGE_OLD_DELAY = 1.0
+PURGE_TIMEOUT = 120
+
+# Metrics (Prometheus formaat) op http://127.0.0.1:9108/metrics
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
 # Gedefieneerde routes:
 ROUTE_PAIRS = [
     ("IRFD", "IPPH"),
@@ -35,6 +158,25 @@ ROUTE_PAIRS = [
     ("ILAR", "ITKO")
 ]
 
+CONFIGURED_ROUTE_PAIRS = list(ROUTE_PAIRS)
+
+# Index: airport -> route paren waar het airport vertrek/aankomst is
+DEPARTURE_ROUTES = collections.defaultdict(list)
+ARRIVAL_ROUTES = collections.defaultdict(list)
+
+# ROUTE_PAIRS = vaste paren + paren waar de route engine een route voor kan maken
+def rebuild_route_index(extra_pairs=()):
+    ROUTE_PAIRS[:] = list(dict.fromkeys(CONFIGURED_ROUTE_PAIRS + list(extra_pairs)))
+
+    DEPARTURE_ROUTES.clear()
+    ARRIVAL_ROUTES.clear()
+    for dep, arr in ROUTE_PAIRS:
+        DEPARTURE_ROUTES[dep].append((dep, arr))
+        ARRIVAL_ROUTES[arr].append((dep, arr))
+
+
+rebuild_route_index()
+
 # Airport ICAO -> FPL namen
 AIRPORT_NAMES = {
     "IRFD": "Greater Rockford",
@@ -51,22 +193,340 @@ client = discord.Client(intents=intents)
 tree = app_commands.CommandTree(client)
 
 
-# initial ATIS laden
-async def fetch_initial_atis():
-    url = "https://24data.ptfs.app/atis"
+# Metrics: simpele counters/histograms, uitgelezen via de lokale /metrics endpoint
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Metric:
+    def __init__(self, name, help_text, kind="counter"):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.series[key] = self.series.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        self.series[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.series.items():
+            lines.append(f"{self.name}{format_labels(key)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, "histogram")
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            # [aantal per bucket, som, totaal]
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("klmva_stage_seconds", "Time spent per pipeline stage (decode, queue, handle)")
+DISCORD_REQUEST_SECONDS = Histogram("klmva_discord_request_seconds", "Discord API request to response time")
+END_TO_END_SECONDS = Histogram("klmva_end_to_end_seconds", "Frame received to Discord message sent/edited")
+RATELIMIT_WAIT_SECONDS = Histogram("klmva_discord_ratelimit_wait_seconds", "Time discord.py waited on a 429")
+FRAMES_TOTAL = Metric("klmva_frames_total", "WebSocket frames by event type and result")
+RECONNECTS_TOTAL = Metric("klmva_reconnects_total", "WebSocket reconnects")
+QUEUE_DROPPED_TOTAL = Metric("klmva_queue_dropped_total", "Events dropped because the queue was full")
+FPL_DUPLICATES_TOTAL = Metric("klmva_fpl_duplicates_total", "Duplicate flight plans suppressed")
+QUEUE_DEPTH = Metric("klmva_event_queue_depth", "Events waiting in the queue", "gauge")
+DELIVERY_LAG_SECONDS = Histogram("klmva_delivery_lag_seconds", "Time a Discord request waited in its channel send lane")
+SEND_LANE_DEPTH = Metric("klmva_send_lane_depth", "Discord requests waiting per channel", "gauge")
+
+METRICS = [
+    STAGE_SECONDS, DISCORD_REQUEST_SECONDS, END_TO_END_SECONDS, RATELIMIT_WAIT_SECONDS,
+    FRAMES_TOTAL, RECONNECTS_TOTAL, QUEUE_DROPPED_TOTAL, FPL_DUPLICATES_TOTAL, QUEUE_DEPTH,
+    DELIVERY_LAG_SECONDS, SEND_LANE_DEPTH
+]
+
+
+# Discord call timen
+async def timed_discord(method, request):
+    started = time.perf_counter()
+    try:
+        return await request
+    finally:
+        DISCORD_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method)
+
+
+# Eén send lane per kanaal: requests in volgorde, met een eigen rate-limit bucket,
+# zodat een traag of gelimiteerd kanaal de andere kanalen niet ophoudt
+class SendLane:
+    def __init__(self, channel_id, rate, per):
+        self.channel_id = channel_id
+        self.rate = rate
+        self.per = per
+        self.queue = asyncio.Queue()
+        self.sent = collections.deque()
+        self.task = None
+        # In de queue of nog bezig
+        self.unfinished = 0
+
+    def submit(self, method, request_factory):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((method, request_factory, time.perf_counter(), future))
+        self.unfinished += 1
+
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+        return future
+
+    # Sliding window: max rate requests per per seconden
+    async def wait_for_bucket(self):
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] >= self.per:
+            self.sent.popleft()
+
+        if len(self.sent) >= self.rate:
+            await asyncio.sleep(self.per - (now - self.sent.popleft()))
+
+        self.sent.append(time.monotonic())
+
+    async def run(self):
+        while True:
+            method, request_factory, queued, future = await self.queue.get()
+
+            try:
+                if future.cancelled():
+                    continue
+
+                await self.wait_for_bucket()
+                DELIVERY_LAG_SECONDS.observe(time.perf_counter() - queued, channel=str(self.channel_id))
+
+                try:
+                    result = await timed_discord(method, request_factory())
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+            finally:
+                self.unfinished -= 1
+
+
+send_lanes = {}
+
+# Discord request via de lane van het kanaal, geeft een future met het resultaat
+def deliver(channel, method, request_factory):
+    lane = send_lanes.get(channel.id)
+    if lane is None:
+        lane = send_lanes[channel.id] = SendLane(channel.id, SEND_LANE_RATE, SEND_LANE_PER)
+
+    return lane.submit(method, request_factory)
+
+
+# Dezelfde request naar meerdere kanalen tegelijk, fouten per kanaal loggen
+async def fan_out(requests, action):
+    results = await asyncio.gather(*requests, return_exceptions=True)
+
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Failed to {action}: {result}")
+
+    return [result for result in results if not isinstance(result, Exception)]
+
+
+def subscribed_channels(feed):
+    channels = []
+
+    for subscription in SUBSCRIPTIONS:
+        if subscription["feed"] != feed:
+            continue
+
+        channel = client.get_channel(subscription["channel"])
+        if channel:
+            channels.append((channel, subscription))
+        else:
+            print(f"Channel {subscription['channel']} not found (guild {subscription['guild']})")
+
+    return channels
+
+
+# discord.py logt een 429 als "We are being rate limited ... Retrying in X seconds." of
+# "Global rate limit has been hit. Retrying in X seconds.". Alleen die wachttijden tellen,
+# niet "Timeout of X was too long, erroring instead." (dan wordt er niet gewacht).
+RATELIMIT_RETRY_PATTERN = re.compile(r"Retrying in ([0-9.]+) seconds")
+
+class RateLimitLogFilter(logging.Filter):
+    def filter(self, record):
+        try:
+            match = RATELIMIT_RETRY_PATTERN.search(record.getMessage())
+        except (TypeError, ValueError):
+            match = None
+
+        if match:
+            RATELIMIT_WAIT_SECONDS.observe(float(match.group(1)))
+        return True
+
+
+logging.getLogger("discord.http").addFilter(RateLimitLogFilter())
+
+
+async def metrics_handler(request):
+    QUEUE_DEPTH.set(event_queue.depth())
+    QUEUE_DROPPED_TOTAL.set(event_queue.dropped)
+    FPL_DUPLICATES_TOTAL.set(fpl_duplicates)
+
+    for channel_id, lane in send_lanes.items():
+        SEND_LANE_DEPTH.set(lane.queue.qsize(), channel=str(channel_id))
+
+    for event_type, count in frames_parsed.items():
+        FRAMES_TOTAL.set(count, type=event_type, result="parsed")
+    for event_type, count in frames_skipped.items():
+        FRAMES_TOTAL.set(count, type=event_type, result="skipped")
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    return web.Response(text="\n".join(lines) + "\n", content_type="text/plain")
+
+
+async def start_metrics_server():
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    try:
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    except OSError as e:
+        print(f"Could not start metrics endpoint: {e}")
+        return
+
+    print(f"Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
+# Gedeelde HTTP sessie voor alle REST calls
+http_session = None
+
+def get_http_session():
+    global http_session
+
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+        )
+
+    return http_session
+
+
+# ATIS via REST laden (bij elke (re)connect en periodiek, naast de websocket).
+# Conditional request + hash van de body: ongewijzigde snapshot kost bijna niks.
+# force=True (na een reconnect): altijd toepassen, want die checks vergelijken met de vorige
+# REST snapshot en niet met de huidige stand (de websocket kan die intussen veranderd hebben).
+atis_etag = None
+atis_last_modified = None
+atis_snapshot_hash = None
+
+# Websocket ATIS verandert de stand buiten de REST snapshot om (of is weggegooid):
+# de volgende REST snapshot moet dan altijd toegepast worden, ook als die gelijk is aan de vorige
+def forget_atis_snapshot():
+    global atis_etag, atis_last_modified, atis_snapshot_hash
+
+    atis_etag = None
+    atis_last_modified = None
+    atis_snapshot_hash = None
+
+async def resync_atis(force=False):
+    global atis_etag, atis_last_modified, atis_snapshot_hash
+
+    started = time.monotonic()
+
+    # Alles wat de websocket hierna ontvangt is nieuwer dan deze snapshot
+    snapshot_version = next_atis_version()
+
+    headers = {}
+    if atis_etag and not force:
+        headers["If-None-Match"] = atis_etag
+    if atis_last_modified and not force:
+        headers["If-Modified-Since"] = atis_last_modified
+
+    try:
+        async with get_http_session().get(ATIS_URL, headers=headers) as resp:
+            if resp.status == 304:
+                return
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
             if resp.status != 200:
-                print("Failed to fetch initial ATIS:", resp.status)
+                print("Failed to fetch ATIS:", resp.status)
                 return
 
-            data = await resp.json()
+            body = await resp.read()
+            atis_etag = resp.headers.get("ETag")
+            atis_last_modified = resp.headers.get("Last-Modified")
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Failed to fetch ATIS: {e}")
+        return
+
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    if digest == atis_snapshot_hash and not force:
+        return
+
+    atis_snapshot_hash = digest
+    data = json_loads(body)
+
+    print(f"Loaded {len(data)} ATIS entries in {time.monotonic() - started:.2f}s")
+
+    await apply_atis_snapshot(data, snapshot_version)
+
+
+# Hele snapshot (REST of ingest hub) in één keer toepassen, daarna één evaluatie van alle geraakte routes
+async def apply_atis_snapshot(data, version):
+    if not BOT_ACTIVE:
+        return
+
+    pairs = {}
+    for atis in data:
+        pairs.update(dict.fromkeys(apply_atis(atis, version, snapshot=True)))
+
+    tasks = await evaluate_routes(pairs, delay=0) if pairs else []
+
+    if not first_route_logged:
+        asyncio.create_task(log_first_route(tasks))
+
 
-            print(f"Loaded {len(data)} ATIS entries")
+async def atis_reconciler():
+    while True:
+        await asyncio.sleep(ATIS_RECONCILE_INTERVAL)
 
-            for atis in data:
-                await handle_atis(atis)
+        # Via de hub houdt die de ATIS bij
+        if not INGEST_HUB_URL:
+            await resync_atis()
 
 
 
@@ -77,44 +537,208 @@ last_send_dep_runway = {}
 last_send_arr_runway = {}
 route_messages = {}
 
-def extract_dep_runway_from_atis(lines):
-    for line in lines:
-        match = re.search(r"DEP RWY (\d{1,2}[LRC]?)", line.upper())
-        if match:
-            runway = match.group(1)
+# ATIS versies: oplopend nummer bij ontvangst, zodat een oudere REST snapshot
+# geen nieuwere websocket ATIS overschrijft
+atis_version = 0
+atis_versions = {}
 
-            # 7 -> 07
-            if runway[0].isdigit() and len(runway) == 1:
-                runway = runway.zfill(2)
+def next_atis_version():
+    global atis_version
 
-            return runway
-    return None 
+    atis_version += 1
+    return atis_version
+
+route_locks = {}
+
+# Hash van de embed inhoud per route bericht, zodat ongewijzigde embeds niet ge-edit worden
+route_message_hashes = {}
+route_hashes_seeded = asyncio.Event()
+ROUTE_HASH_SEED_TIMEOUT = 10
+
+
+# Lokale state: schrijven wordt gebufferd en door een thread weggeschreven.
+# Pas actief na warm_state(), zodat bench/ bot.py kan importeren zonder database.
+state_store = StateStore(STATE_DB_FILE, STATE_FLUSH_INTERVAL, FPL_STATS_DAYS * 86400)
+
+
+# Route bericht ID's laden (oude JSON opslag) / opslaan
+def load_route_messages():
+    if not os.path.exists(ROUTE_MESSAGES_FILE):
+        return
+
+    try:
+        with open(ROUTE_MESSAGES_FILE) as f:
+            route_messages.update({
+                message_key(CHANNEL_ID_ROUTE, key): int(message_id) for key, message_id in json.load(f).items()
+            })
+    except (OSError, ValueError) as e:
+        print(f"Could not load {ROUTE_MESSAGES_FILE}: {e}")
+
+
+def save_route_messages():
+    state_store.replace("route_messages", route_messages)
+
+
+# last_send per route bericht ("<channel id>/<route key>"): welke runways dat kanaal nu toont
+def save_last_send(key):
+    if key in last_send_dep_runway:
+        state_store.set("last_send", key, last_send_dep_runway[key])
+    else:
+        state_store.delete("last_send", key)
+
+
+def forget_last_send(key):
+    last_send_dep_runway.pop(key, None)
+    save_last_send(key)
+
+
+# Warm start: alles in één keer uit de database, zodat de bot meteen met de
+# laatst bekende runways draait terwijl de ATIS resync nog bezig is
+def warm_state():
+    state = state_store.open(flight_plans_since=time.time() - FPL_STATS_DAYS * 86400)
+
+    atis_dep_runways.update(state.get("atis_dep", {}))
+    atis_arr_runways.update(state.get("atis_arr", {}))
+    last_send_dep_runway.update({
+        key if "/" in key else message_key(CHANNEL_ID_ROUTE, key): tuple(value)
+        for key, value in state.get("last_send", {}).items()
+    })
+    route_messages.update({
+        # Keys van voor de abonnementen horen bij het route kanaal
+        key if "/" in key else message_key(CHANNEL_ID_ROUTE, key): int(message_id)
+        for key, message_id in state.get("route_messages", {}).items()
+    })
+
+    if not route_messages:
+        load_route_messages()
+        save_route_messages()
+
+    for received, event_type, aircraft, departing, arriving in state.get("flight_plans", []):
+        record_fpl_stats(event_type, departing, arriving, aircraft, received)
+
+    print(
+        f"Warm start: {len(atis_dep_runways)} departure runways, {len(atis_arr_runways)} arrival runways, "
+        f"{len(route_messages)} route messages, {fpl_stats_total['count']} flight plans"
+    )
+
+
+# ATIS parser: één regex, één keer door de regels voor zowel DEP als ARR.
+# Herkent o.a. "DEP RWY 25L", "ARR RWY 25L/25C", "DEP/ARR RWY 07" en "RWY 07 IN USE".
+# De regex begint op RWY/RUNWAY (veel sneller op lange regels dan een optionele
+# DEP/ARR groep vooraan), DEP/ARR wordt daarna in de tekst ervoor opgezocht.
+ATIS_RUNWAY_PATTERN = re.compile(
+    r"(?:RWY|RUNWAY)S?\s+(\d{1,2}[LRC]?)\b(?:\s*/\s*\d{1,2}[LRC]?\b)*"
+    r"(\s+IN\s+USE)?",
+    re.IGNORECASE
+)
+ATIS_KIND_PATTERN = re.compile(r"\b(DEP|ARR)(?:\s*/\s*(DEP|ARR))?\s+$", re.IGNORECASE)
+ATIS_CACHE_SIZE = 256
+
+atis_parse_cache = collections.OrderedDict()
+atis_hashes = {}
+
+
+def normalize_runway(runway):
+    runway = runway.upper()
+
+    # 7 -> 07
+    if runway[0].isdigit() and len(runway) == 1:
+        runway = runway.zfill(2)
+
+    return runway
+
+
+def atis_hash(lines):
+    return hashlib.blake2b("\n".join(lines).encode(), digest_size=16).digest()
+
+
+def parse_atis_runways(lines):
+    dep_runway = None
+    arr_runway = None
+    in_use_runway = None
 
-def extract_arr_runway_from_atis(lines):
     for line in lines:
-        match = re.search(r"ARR RWY (\d{1,2}[LRC]?)", line.upper())
-        if match:
-            runway = match.group(1)
+        for match in ATIS_RUNWAY_PATTERN.finditer(line):
+            start = match.start()
+
+            # Alleen los woord, niet midden in een ander woord
+            if start and line[start - 1].isalnum():
+                continue
+
+            runway, in_use = match.groups()
+            kind = ATIS_KIND_PATTERN.search(line, max(0, start - 12), start)
+
+            if kind:
+                kind = "".join(part for part in kind.groups() if part).upper()
+                # Bij meerdere banen ("25L/25C") telt de eerste
+                if "DEP" in kind and not dep_runway:
+                    dep_runway = normalize_runway(runway)
+                if "ARR" in kind and not arr_runway:
+                    arr_runway = normalize_runway(runway)
+
+            elif in_use and not in_use_runway:
+                in_use_runway = normalize_runway(runway)
+
+        if dep_runway and arr_runway:
+            break
+
+    # "RWY 07 IN USE" geldt voor vertrek en aankomst als die niet apart genoemd zijn
+    return dep_runway or in_use_runway, arr_runway or in_use_runway
+
+
+# Parse resultaat onthouden per ATIS hash (LRU)
+def parse_atis_cached(digest, lines):
+    if digest in atis_parse_cache:
+        atis_parse_cache.move_to_end(digest)
+        return atis_parse_cache[digest]
+
+    result = parse_atis_runways(lines)
+    atis_parse_cache[digest] = result
+
+    if len(atis_parse_cache) > ATIS_CACHE_SIZE:
+        atis_parse_cache.popitem(last=False)
 
-            # 7 -> 07
-            if runway[0].isdigit() and len(runway) == 1:
-                runway = runway.zfill(2)
+    return result
 
-            return runway
-    return None 
 
-# Routes laden
-with open("routes.json") as f:
-    ROUTES = json.load(f)
+def extract_dep_runway_from_atis(lines):
+    return parse_atis_runways(lines)[0]
+
+def extract_arr_runway_from_atis(lines):
+    return parse_atis_runways(lines)[1]
+
+# Routes (platte tabel, gevuld door load_routes)
+ROUTES = {}
+ROUTE_TABLE = {}
+routes_mtime = None
+
+# Route engine voor alles zonder expliciete route in routes.json
+ROUTE_ENGINE = RouteEngine()
+airways_mtime = None
+engine_entries = {}
 
 def get_route_config(dep_airport, dep_runway, arr_airport, arr_runway):
-    return (
-        ROUTES
-        .get(dep_airport, {})
-        .get(dep_runway, {})
-        .get(arr_airport, {})
-        .get(arr_runway, {})
-    )
+    key = (dep_airport, dep_runway, arr_airport, arr_runway)
+    config = ROUTE_TABLE.get(key)
+
+    # Expliciete route in routes.json gaat voor
+    if config and config["route"]:
+        return config
+
+    result = ROUTE_ENGINE.route(*key)
+    if result is None:
+        return config or {}
+
+    # Entry hergebruiken zolang de engine hetzelfde resultaat geeft
+    cached = engine_entries.get(key)
+    if cached is None or cached[0] is not result:
+        route, flightlevel, _ = result
+        if config and config["flightlevel"]:
+            flightlevel = config["flightlevel"]
+
+        cached = engine_entries[key] = (result, build_route_entry(*key, flightlevel, route))
+
+    return cached[1]
 
 
 # FPL bouwen
@@ -150,31 +774,25 @@ def route_key(dep_airport, arr_airport):
     return f"{dep_airport}-{arr_airport}"
 
 
-# route embed
-async def send_route_embed(dep_airport, dep_runway, arr_airport, arr_runway):
-    if not BOT_ACTIVE:
-        return
-
-    config = get_route_config(dep_airport, dep_runway, arr_airport, arr_runway)
-
-    if not config:
-        return
+# Route berichten per kanaal: "<channel id>/<route key>"
+def message_key(channel_id, key):
+    return f"{channel_id}/{key}"
 
-    command = build_flightplan_command(
-        aircraft="A/Bxxx",
-        departing=dep_airport,
-        dep_rwy=dep_runway,
-        arriving=arr_airport,
-        arr_rwy=arr_runway,
-        flightlevel=config["flightlevel"],
-        route=config["route"]
-    )
 
-    channel = client.get_channel(CHANNEL_ID_ROUTE)
+# Inhoud hash van een embed, werkt voor zelfgebouwde embeds en embeds uit een bestaand bericht
+def embed_content_hash(embed):
+    content = [
+        embed.title,
+        embed.description,
+        embed.color.value if embed.color else None,
+        [(field.name, field.value, field.inline) for field in embed.fields],
+        embed.footer.text
+    ]
+    return hashlib.blake2b(json.dumps(content).encode(), digest_size=16).hexdigest()
 
-    if not channel:
-        return
 
+# route embed
+def build_route_embed(dep_airport, dep_runway, arr_airport, command):
     embed = discord.Embed(
         title=f"📍 KLM Route Recommendation – {dep_airport} to {arr_airport}",
         description=f"**Active departure runway:** {dep_runway}",
@@ -187,178 +805,1344 @@ async def send_route_embed(dep_airport, dep_runway, arr_airport, arr_runway):
         inline=False
     )
 
-    key = route_key(dep_airport, arr_airport)
-
-    # 🔁 Update of nieuw bericht
-    if key in route_messages:
-        try:
-            message = await channel.fetch_message(route_messages[key])
-            await message.edit(embed=embed)
-            return
-        except discord.NotFound:
-            # Bericht is handmatig verwijderd
-            del route_messages[key]
+    return embed
 
-    # Nieuw bericht
-    message = await channel.send(embed=embed)
-    route_messages[key] = message.id
 
+# routes.json compileren: placeholders/ongeldige entries eruit, command + embed vooraf renderen
+AIRPORT_PATTERN = re.compile(r"[A-Z]{4}")
+RUNWAY_PATTERN = re.compile(r"\d{1,2}[LRC]?")
 
-# Anti spam
-async def evaluate_routes():
-    for dep_airport, arr_airport in ROUTE_PAIRS:
-        dep_runway = atis_dep_runways.get(dep_airport)
-        arr_runway = atis_arr_runways.get(arr_airport)
+def compile_routes(routes):
+    table = {}
+    skipped = 0
 
-        if not dep_runway or not arr_runway:
+    for dep_airport, dep_runways in routes.items():
+        if not AIRPORT_PATTERN.fullmatch(dep_airport) or not isinstance(dep_runways, dict):
+            skipped += 1
             continue
 
-        # Anti-spam key per combinatie
-        key = f"{dep_airport}-{arr_airport}"
+        for dep_runway, arrivals in dep_runways.items():
+            if not RUNWAY_PATTERN.fullmatch(dep_runway) or not isinstance(arrivals, dict):
+                skipped += 1
+                continue
 
-        if last_send_dep_runway.get(key) == (dep_runway, arr_runway):
-            continue
+            for arr_airport, arr_runways in arrivals.items():
+                if not AIRPORT_PATTERN.fullmatch(arr_airport) or not isinstance(arr_runways, dict):
+                    skipped += 1
+                    continue
 
-        config = get_route_config(
-            dep_airport,
-            dep_runway,
-            arr_airport,
-            arr_runway
-        )
+                for arr_runway, config in arr_runways.items():
+                    if not RUNWAY_PATTERN.fullmatch(arr_runway) or not isinstance(config, dict):
+                        skipped += 1
+                        continue
 
-        if not config:
-            continue
+                    table[(dep_airport, dep_runway, arr_airport, arr_runway)] = build_route_entry(
+                        dep_airport,
+                        dep_runway,
+                        arr_airport,
+                        arr_runway,
+                        str(config.get("flightlevel", "")).strip(),
+                        " ".join(str(config.get("route", "")).split())
+                    )
 
-        last_send_dep_runway[key] = (dep_runway, arr_runway)
+    return table, skipped
 
-        await send_route_embed(
-            dep_airport,
-            dep_runway,
-            arr_airport,
-            arr_runway
-        )
 
+# Route entry met vooraf gerenderd command + embed
+def build_route_entry(dep_airport, dep_runway, arr_airport, arr_runway, flightlevel, route):
+    command = build_flightplan_command(
+        aircraft="A/Bxxx",
+        departing=dep_airport,
+        dep_rwy=dep_runway,
+        arriving=arr_airport,
+        arr_rwy=arr_runway,
+        flightlevel=flightlevel,
+        route=route
+    )
+    embed = build_route_embed(dep_airport, dep_runway, arr_airport, command)
 
-# ATIS event handler
-async def handle_atis(data):
-    if not BOT_ACTIVE:
-        return
-    
-    airport = data.get("airport")
-    lines = data.get("lines", [])
+    return {
+        "flightlevel": flightlevel,
+        "route": route,
+        "command": command,
+        "embed": embed,
+        "embed_hash": embed_content_hash(embed)
+    }
 
-    dep_runway = extract_dep_runway_from_atis(lines)
-    arr_runway = extract_arr_runway_from_atis(lines)
-    print(f"ATIS received for {airport}, departure runway {dep_runway}, arrival runway {arr_runway}")
-    if dep_runway:
-        atis_dep_runways[airport] = dep_runway
 
-    if arr_runway:
-        atis_arr_runways[airport] = arr_runway
+def load_routes():
+    global ROUTES, ROUTE_TABLE, routes_mtime
 
-    await evaluate_routes()
+    mtime = os.stat(ROUTES_FILE).st_mtime_ns
+    with open(ROUTES_FILE) as f:
+        routes = json.load(f)
 
+    table, skipped = compile_routes(routes)
 
+    # In één keer omwisselen, handlers zien nooit een halve tabel
+    ROUTES, ROUTE_TABLE, routes_mtime = routes, table, mtime
+    engine_entries.clear()
+    build_autocomplete_index()
+    print(f"Loaded {len(table)} routes from {ROUTES_FILE} ({skipped} invalid entries skipped)")
 
-# KLMVA FPL handler
-async def handle_flight_plan(data, event_type):
-    route = data.get("route", "")
 
-    # Normalize (hoofdletters + spaties verwijderen aan begin/einde)
-    route_clean = route.upper().strip()
+def load_airways():
+    global airways_mtime
 
-    # Filter:
-    if not route.endswith("/RMK KLMVA"):
+    if not os.path.exists(AIRWAYS_FILE):
         return
 
-    # Knip "/RMK KLMVA" van het einde af
-    cleaned_route = route_clean.removesuffix("/RMK KLMVA").strip()
-
-    # Gebruik originele formatting behalve het RMK deel
-    if route.upper().strip().endswith("/RMK KLMVA"):
-        cleaned_route = route[: -len("/RMK KLMVA")].strip()
+    mtime = os.stat(AIRWAYS_FILE).st_mtime_ns
+    with open(AIRWAYS_FILE) as f:
+        graph = json.load(f)
 
-    channel = client.get_channel(CHANNEL_ID_FPL)
-    if channel is None:
-        print("Channel not found!")
-        return
+    # Alleen gecachte oplossingen die door de wijziging geraakt worden vervallen
+    invalidated = ROUTE_ENGINE.update(graph)
+    airways_mtime = mtime
+    rebuild_route_index(ROUTE_ENGINE.pairs())
+    build_autocomplete_index()
 
-    embed = discord.Embed(
-        title="✈️ KLM VA Flight Plan Filed",
-        color=0x00A1E4
+    print(
+        f"Loaded route graph from {AIRWAYS_FILE}: {len(ROUTE_ENGINE.points)} waypoints, "
+        f"{len(ROUTE_ENGINE.edges)} airway segments ({invalidated} cached solutions invalidated)"
     )
 
-    embed.add_field(name="Username", value=data.get("robloxName", "N/A"), inline=True)
-    embed.add_field(name="Callsign", value=data.get("callsign", "N/A"), inline=True)
-    embed.add_field(name="Aircraft", value=data.get("aircraft", "N/A"), inline=True)
-    embed.add_field(name="Flight Rules", value=data.get("flightrules", "N/A"), inline=True)
-    embed.add_field(name="From", value=data.get("departing", "N/A"), inline=True)
-    embed.add_field(name="To", value=data.get("arriving", "N/A"), inline=True)
-    embed.add_field(name="Flight Level", value=data.get("flightlevel", "N/A"), inline=True)
-    embed.add_field(name="Route", value=cleaned_route or "N/A", inline=False)
 
-    embed.set_footer(text=f"Server: {'Event' if event_type == 'EVENT_FLIGHT_PLAN' else 'Main'}")
+# /route autocomplete: alle antwoorden vooraf per prefix, zodat een toetsaanslag één dict lookup is
+AUTOCOMPLETE_LIMIT = 25  # max choices van Discord
+ROUTE_RESPONSE_CACHE_SIZE = 256
 
-    await channel.send(
-        content=f"<@&{ROLE_ID}>",
-        embed=embed
-    )
+airport_choices = {}
+runway_choices = {}
+# ("dep"/"arr", airport) -> banen met een route, om /route invoer te controleren
+route_runways = {}
+route_response_cache = collections.OrderedDict()
 
-# connectie naar websocket
-async def websocket_listener():
-    await client.wait_until_ready()
+def prefix_index(options):
+    index = collections.defaultdict(list)
 
-    while not client.is_closed():
-        try:
-            async with websockets.connect(WSS_URL, origin=None) as websocket:
-                print("Connected to 24data WebSocket")
+    for value, label, words in options:
+        prefixes = {""}
+        for word in words:
+            word = word.upper()
+            prefixes.update(word[:length] for length in range(1, len(word) + 1))
 
-                async for message in websocket:
-                    payload = json.loads(message)
+        for prefix in prefixes:
+            if len(index[prefix]) < AUTOCOMPLETE_LIMIT:
+                index[prefix].append(app_commands.Choice(name=label, value=value))
 
-                    event_type = payload.get("t")
-                    data = payload.get("d")
+    return dict(index)
 
-                    if event_type in ["FLIGHT_PLAN", "EVENT_FLIGHT_PLAN"]:
-                        await handle_flight_plan(data, event_type)
 
-                    elif event_type == "ATIS":
-                        await handle_atis(data)
+def build_autocomplete_index():
+    global airport_choices, runway_choices, route_runways
 
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-            print("Reconnecting in 5 seconds...")
-            await asyncio.sleep(5)
+    runways = collections.defaultdict(set)
+    for dep_airport, dep_runway, arr_airport, arr_runway in ROUTE_TABLE:
+        runways[("dep", dep_airport)].add(dep_runway)
+        runways[("arr", arr_airport)].add(arr_runway)
+    for airport, runway in ROUTE_ENGINE.sids:
+        runways[("dep", airport)].add(runway)
+    for airport, runway in ROUTE_ENGINE.stars:
+        runways[("arr", airport)].add(runway)
 
-# check of iemand de MASTER_ROLE heeft
-def has_offline_role(interaction: discord.Interaction) -> bool:
-    return any(role.id == MASTER_ROLE for role in interaction.user.roles)
+    airports = sorted(set(AIRPORT_NAMES) | {airport for _, airport in runways})
+    airport_options = []
+    for airport in airports:
+        name = AIRPORT_NAMES.get(airport)
+        label = f"{airport} – {name}" if name else airport
+        airport_options.append((airport, label, [airport] + (name.split() if name else [])))
 
+    # Nieuwe indexen in één keer omwisselen
+    airport_choices = prefix_index(airport_options)
+    runway_choices = {
+        key: prefix_index([(runway, runway, [runway]) for runway in sorted(values)])
+        for key, values in runways.items()
+    }
+    route_runways = dict(runways)
+    route_response_cache.clear()
 
-# /offline command
-@tree.command(
-    name="offline",
-    description="Disable bot and clear route channel",
-    guild=discord.Object(id=SERVER_ID)
-)
-async def offline(interaction: discord.Interaction):
-    global BOT_ACTIVE
 
-    if not has_offline_role(interaction):
-        await interaction.response.send_message(
-            "❌ You are not allowed to use this command.",
-            ephemeral=True
-        )
-        return
+load_routes()
+load_airways()
 
-    BOT_ACTIVE = False
 
-    channel = client.get_channel(CHANNEL_ID_ROUTE)
-    if not channel:
-        await interaction.response.send_message(
-            "Route channel not found.",
-            ephemeral=True
-        )
+# Huidige command per actieve route (voor het vergelijken na een reload)
+def active_route_commands():
+    commands = {}
+
+    for dep_airport, arr_airport in ROUTE_PAIRS:
+        dep_runway = atis_dep_runways.get(dep_airport)
+        arr_runway = atis_arr_runways.get(arr_airport)
+
+        if dep_runway and arr_runway:
+            config = get_route_config(dep_airport, dep_runway, arr_airport, arr_runway)
+            commands[(dep_airport, arr_airport)] = config.get("command")
+
+    return commands
+
+
+# routes.json en airways.json in de gaten houden en alleen gewijzigde actieve routes updaten
+async def routes_watcher():
+    while True:
+        await asyncio.sleep(ROUTES_RELOAD_INTERVAL)
+
+        reloads = []
+        try:
+            if os.stat(ROUTES_FILE).st_mtime_ns != routes_mtime:
+                reloads.append((ROUTES_FILE, load_routes))
+            if os.path.exists(AIRWAYS_FILE) and os.stat(AIRWAYS_FILE).st_mtime_ns != airways_mtime:
+                reloads.append((AIRWAYS_FILE, load_airways))
+        except OSError as e:
+            print(f"Could not check route files: {e}")
+            continue
+
+        if not reloads:
+            continue
+
+        before = active_route_commands()
+
+        for file_name, reload in reloads:
+            try:
+                reload()
+            except (OSError, ValueError) as e:
+                print(f"Could not reload {file_name}: {e}")
+
+        changed = []
+        for pair, command in active_route_commands().items():
+            if before.get(pair) != command:
+                for channel, _ in subscribed_channels("route"):
+                    forget_last_send(message_key(channel.id, route_key(*pair)))
+                changed.append(pair)
+
+        if changed:
+            print(f"Route files changed, updating {len(changed)} routes")
+            await evaluate_routes(changed)
+
+
+# Startup tijd loggen als de eerste route evaluatie klaar is (bekende routes of ATIS snapshot),
+# ook als er niks gepost hoefde te worden (warme herstart)
+first_route_logged = False
+
+async def log_first_route(tasks):
+    global first_route_logged
+
+    if first_route_logged:
+        return
+
+    if tasks:
+        await asyncio.wait(tasks)
+
+    if not first_route_logged:
+        first_route_logged = True
+        print(f"Startup: first route evaluation done {time.monotonic() - PROCESS_START:.2f}s after process start")
+
+
+# route embed versturen
+# channels None = alle route abonnementen. True als er in minstens één kanaal iets gepost/ge-edit is.
+async def send_route_embed(dep_airport, dep_runway, arr_airport, arr_runway, channels=None):
+    if not BOT_ACTIVE:
+        return False
+
+    config = get_route_config(dep_airport, dep_runway, arr_airport, arr_runway)
+
+    if not config:
+        return False
+
+    if channels is None:
+        channels = [channel for channel, _ in subscribed_channels("route")]
+
+    key = route_key(dep_airport, arr_airport)
+
+    async def upsert(channel):
+        changed = await upsert_route_message(channel, key, config["embed"], config["embed_hash"])
+
+        # Pas na een gelukte send/edit (of al dezelfde inhoud) markeren, per kanaal
+        last_send_dep_runway[message_key(channel.id, key)] = (dep_runway, arr_runway)
+        save_last_send(message_key(channel.id, key))
+        return changed
+
+    # Embed is al één keer gerenderd, alle route kanalen tegelijk bijwerken
+    results = await fan_out([upsert(channel) for channel in channels], f"update route {key}")
+    return any(results)
+
+
+# Bericht in een route kanaal bijwerken of nieuw posten (routes + traffic status)
+async def upsert_route_message(channel, key, embed, embed_hash):
+    key = message_key(channel.id, key)
+
+    # Eerst de hashes van de bestaande berichten kennen, anders editen we alles na een restart
+    if not route_hashes_seeded.is_set():
+        try:
+            await asyncio.wait_for(route_hashes_seeded.wait(), ROUTE_HASH_SEED_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+    # Eén update tegelijk per route, anders posten twee workers allebei een nieuw bericht
+    async with route_locks.setdefault(key, asyncio.Lock()):
+        # 🔁 Update of nieuw bericht (direct editen op ID, zonder fetch)
+        if key in route_messages:
+            # Inhoud al hetzelfde -> geen Discord call
+            if route_message_hashes.get(key) == embed_hash:
+                return False
+
+            try:
+                message = channel.get_partial_message(route_messages[key])
+                await deliver(channel, "edit", lambda: message.edit(embed=embed))
+                route_message_hashes[key] = embed_hash
+                return True
+            except discord.NotFound:
+                # Bericht is handmatig verwijderd
+                del route_messages[key]
+
+        # Nieuw bericht
+        message = await deliver(channel, "send", lambda: channel.send(embed=embed))
+        route_messages[key] = message.id
+        route_message_hashes[key] = embed_hash
+        save_route_messages()
+        return True
+
+
+# Bij startup: hashes van de bestaande route berichten uitlezen (niet verwijderen)
+async def seed_all_route_hashes():
+    channels = subscribed_channels("route")
+
+    try:
+        # Berichten in kanalen die niet meer geabonneerd zijn vergeten
+        prefixes = tuple(message_key(channel.id, "") for channel, _ in channels)
+        stale = [key for key in route_messages if not key.startswith(prefixes)]
+        for key in stale:
+            del route_messages[key]
+            forget_last_send(key)
+
+        if stale:
+            save_route_messages()
+
+        await asyncio.gather(*(seed_route_hashes(channel) for channel, _ in channels))
+
+    finally:
+        route_hashes_seeded.set()
+
+
+async def seed_route_hashes(channel):
+    prefix = message_key(channel.id, "")
+    message_keys = {message_id: key for key, message_id in route_messages.items() if key.startswith(prefix)}
+
+    try:
+        async for message in channel.history(limit=None):
+            key = message_keys.pop(message.id, None)
+
+            if key and message.embeds:
+                route_message_hashes[key] = embed_content_hash(message.embeds[0])
+
+            if not message_keys:
+                break
+
+        # Niet meer in het kanaal -> straks een nieuw bericht
+        for key in message_keys.values():
+            route_messages.pop(key, None)
+            forget_last_send(key)
+
+        if message_keys:
+            save_route_messages()
+
+        print(f"Seeded route message hashes for channel {channel.id}")
+
+    except discord.HTTPException as e:
+        print(f"Could not read route channel {channel.id}: {e}")
+
+
+# Anti spam
+async def update_routes(pairs):
+    sent = 0
+    channels = [channel for channel, _ in subscribed_channels("route")]
+
+    for dep_airport, arr_airport in pairs:
+        dep_runway = atis_dep_runways.get(dep_airport)
+        arr_runway = atis_arr_runways.get(arr_airport)
+
+        if not dep_runway or not arr_runway:
+            continue
+
+        # Anti-spam per kanaal: alleen kanalen die deze combinatie nog niet tonen
+        key = route_key(dep_airport, arr_airport)
+        targets = [
+            channel for channel in channels
+            if last_send_dep_runway.get(message_key(channel.id, key)) != (dep_runway, arr_runway)
+        ]
+
+        if not targets:
+            continue
+
+        config = get_route_config(
+            dep_airport,
+            dep_runway,
+            arr_airport,
+            arr_runway
+        )
+
+        if not config:
+            continue
+
+        # send_route_embed markeert alleen de kanalen waar het gelukt is
+        if await send_route_embed(
+            dep_airport,
+            dep_runway,
+            arr_airport,
+            arr_runway,
+            targets
+        ):
+            sent += 1
+
+    return sent
+
+
+# Coalescing: per route één update na ROUTE_COALESCE_WINDOW, met de stand van dat moment.
+# A -> B -> A binnen het window geeft dus geen edit (last_send is dan nog A).
+pending_route_updates = {}
+
+async def delayed_route_update(dep_airport, arr_airport, received=None, delay=None):
+    key = route_key(dep_airport, arr_airport)
+
+    try:
+        await asyncio.sleep(ROUTE_COALESCE_WINDOW if delay is None else delay)
+    finally:
+        # Wijzigingen tijdens het versturen krijgen weer hun eigen window
+        pending_route_updates.pop(key, None)
+
+    try:
+        sent = await update_routes([(dep_airport, arr_airport)])
+    except Exception as e:
+        print(f"Route update error ({key}): {e}")
+        return
+
+    if sent and received:
+        END_TO_END_SECONDS.observe(time.perf_counter() - received, event="ATIS")
+
+
+# delay=0 voor een complete snapshot (REST), die hoeft niet samengevoegd te worden.
+# Geeft de (al lopende) update tasks van deze routes terug.
+async def evaluate_routes(pairs=ROUTE_PAIRS, received=None, delay=None):
+    tasks = []
+
+    for dep_airport, arr_airport in pairs:
+        key = route_key(dep_airport, arr_airport)
+
+        if key not in pending_route_updates:
+            pending_route_updates[key] = asyncio.create_task(
+                delayed_route_update(dep_airport, arr_airport, received, delay)
+            )
+        tasks.append(pending_route_updates[key])
+
+    return tasks
+
+
+# ATIS event handler
+async def handle_atis(data, version=None, received=None):
+    if not BOT_ACTIVE:
+        return
+
+    pairs = apply_atis(data, version)
+
+    if pairs:
+        await evaluate_routes(pairs, received)
+
+
+# ATIS verwerken in de runway status, geeft de route paren terug die opnieuw bekeken moeten worden
+def apply_atis(data, version=None, snapshot=False):
+    airport = data.get("airport")
+    lines = data.get("lines", [])
+
+    if version is None:
+        version = next_atis_version()
+
+    # Ouder dan wat we al hebben -> negeren
+    if atis_versions.get(airport, 0) > version:
+        return []
+
+    atis_versions[airport] = version
+
+    # Zelfde ATIS opnieuw uitgezonden -> niks te doen
+    digest = atis_hash(lines)
+    if atis_hashes.get(airport) == digest:
+        return []
+
+    atis_hashes[airport] = digest
+
+    if not snapshot:
+        forget_atis_snapshot()
+
+    dep_runway, arr_runway = parse_atis_cached(digest, lines)
+    print(f"ATIS received for {airport}, departure runway {dep_runway}, arrival runway {arr_runway}")
+
+    # Alleen routes van/naar dit airport opnieuw bekijken, en alleen als de baan veranderd is
+    pairs = []
+
+    if dep_runway and atis_dep_runways.get(airport) != dep_runway:
+        atis_dep_runways[airport] = dep_runway
+        state_store.set("atis_dep", airport, dep_runway)
+        pairs.extend(DEPARTURE_ROUTES.get(airport, []))
+
+    if arr_runway and atis_arr_runways.get(airport) != arr_runway:
+        atis_arr_runways[airport] = arr_runway
+        state_store.set("atis_arr", airport, arr_runway)
+        pairs.extend(ARRIVAL_ROUTES.get(airport, []))
+
+    return pairs
+
+
+
+# VA FPL handler
+# Alle remarks en callsign prefixes van alle VA's in één regex per soort, zodat
+# het matchen per frame niet duurder wordt met meer VA's.
+def compile_tenants(tenants):
+    remarks = {}
+    callsigns = {}
+
+    for tenant in tenants:
+        for remark in tenant.get("remarks", []):
+            remarks[remark.upper()] = tenant
+        for prefix in tenant.get("callsigns", []):
+            callsigns[prefix.upper()] = tenant
+
+    def alternation(keys):
+        # Langste eerst, zodat "KLMVA2" niet als "KLMVA" matcht
+        return "|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True))
+
+    return {
+        "remark": re.compile(rf"/RMK\s+({alternation(remarks)})\s*$", re.IGNORECASE) if remarks else None,
+        "callsign": re.compile(rf"\s*({alternation(callsigns)})", re.IGNORECASE) if callsigns else None,
+        "remarks": remarks,
+        "callsigns": callsigns
+    }
+
+
+TENANT_MATCHER = compile_tenants(VA_TENANTS)
+
+
+def tenant_display(tenant):
+    return tenant.get("display") or tenant["name"]
+
+
+# Statistieken en traffic tellen alle VA's, dus ook alle namen in de titel
+VA_DISPLAY = " / ".join(tenant_display(tenant) for tenant in VA_TENANTS)
+
+# (tenant, route zonder remark) of (None, None) als het flight plan bij geen enkele VA hoort.
+# Originele formatting van de route blijft staan.
+def match_tenant(data, matcher=None):
+    matcher = matcher or TENANT_MATCHER
+    route = data.get("route") or ""
+
+    match = matcher["remark"] and matcher["remark"].search(route)
+    if match:
+        return matcher["remarks"][match.group(1).upper()], route[: match.start()].strip()
+
+    match = matcher["callsign"] and matcher["callsign"].match(str(data.get("callsign") or ""))
+    if match:
+        return matcher["callsigns"][match.group(1).upper()], route.strip()
+
+    return None, None
+
+
+async def handle_flight_plan(data, event_type, received=None):
+    tenant, cleaned_route = match_tenant(data)
+
+    if tenant is None:
+        return
+
+    track_flight_plan(data)
+
+    embed = discord.Embed(
+        title=f"✈️ {tenant_display(tenant)} Flight Plan Filed",
+        color=0x00A1E4
+    )
+
+    embed.add_field(name="Username", value=data.get("robloxName", "N/A"), inline=True)
+    embed.add_field(name="Callsign", value=data.get("callsign", "N/A"), inline=True)
+    embed.add_field(name="Aircraft", value=data.get("aircraft", "N/A"), inline=True)
+    embed.add_field(name="Flight Rules", value=data.get("flightrules", "N/A"), inline=True)
+    embed.add_field(name="From", value=data.get("departing", "N/A"), inline=True)
+    embed.add_field(name="To", value=data.get("arriving", "N/A"), inline=True)
+    embed.add_field(name="Flight Level", value=data.get("flightlevel", "N/A"), inline=True)
+    embed.add_field(name="Route", value=cleaned_route or "N/A", inline=False)
+
+    embed.set_footer(text=f"Server: {'Event' if event_type == 'EVENT_FLIGHT_PLAN' else 'Main'}")
+
+    key = flight_plan_key(data, cleaned_route)
+    announcement = find_duplicate_flight_plan(key)
+
+    if announcement:
+        await handle_duplicate_flight_plan(announcement, embed)
+        return
+
+    announcement = {
+        "embed": embed, "messages": None, "embeds": None, "index": None, "received": received, "tenant": tenant
+    }
+    remember_flight_plan(key, announcement)
+    state_store.add_flight_plan(event_type, data)
+    record_fpl_stats(event_type, data.get("departing"), data.get("arriving"), data.get("aircraft"))
+    announce_flight_plan(announcement)
+
+
+# FPL statistieken: tellers per dag plus lopende totalen over het hele window.
+# Bijgewerkt per flight plan, zodat /fplstats niks hoeft te scannen.
+def new_fpl_counts():
+    return {
+        "count": 0,
+        "routes": collections.Counter(),
+        "aircraft": collections.Counter(),
+        "servers": collections.Counter()
+    }
+
+
+fpl_stats_days = collections.OrderedDict()
+fpl_stats_total = new_fpl_counts()
+
+def fpl_stats_day(timestamp=None):
+    return datetime.datetime.fromtimestamp(timestamp or time.time(), datetime.timezone.utc).date()
+
+
+# Dagen die buiten het window vallen eraf halen en van de totalen aftrekken
+def expire_fpl_stats(today):
+    cutoff = today - datetime.timedelta(days=FPL_STATS_DAYS)
+
+    while fpl_stats_days and next(iter(fpl_stats_days)) <= cutoff:
+        _, counts = fpl_stats_days.popitem(last=False)
+
+        fpl_stats_total["count"] -= counts["count"]
+        for field in ("routes", "aircraft", "servers"):
+            fpl_stats_total[field] -= counts[field]
+
+
+def record_fpl_stats(event_type, departing, arriving, aircraft, timestamp=None):
+    day = fpl_stats_day(timestamp)
+    expire_fpl_stats(fpl_stats_day())
+
+    if day <= fpl_stats_day() - datetime.timedelta(days=FPL_STATS_DAYS):
+        return
+
+    if day not in fpl_stats_days:
+        fpl_stats_days[day] = new_fpl_counts()
+
+    route = f"{departing or '?'}-{arriving or '?'}"
+    server = "Event" if event_type == "EVENT_FLIGHT_PLAN" else "Main"
+
+    for counts in (fpl_stats_days[day], fpl_stats_total):
+        counts["count"] += 1
+        counts["routes"][route] += 1
+        counts["aircraft"][aircraft or "?"] += 1
+        counts["servers"][server] += 1
+
+
+# Live KLM verkeer: piloten uit de flight plans, posities uit de aircraft data frames
+traffic_store = TrafficStore(TRAFFIC_CAPACITY, TRAFFIC_GRID_SIZE)
+traffic_pilots = {}
+traffic_errors = 0
+
+def traffic_name(name):
+    return "".join(char for char in str(name).upper() if char.isalnum())
+
+
+def track_flight_plan(data):
+    info = {
+        "callsign": data.get("callsign"),
+        "aircraft": data.get("aircraft"),
+        "departing": data.get("departing"),
+        "arriving": data.get("arriving")
+    }
+    expires = time.monotonic() + TRAFFIC_PILOT_TTL
+
+    # Matchen op Roblox naam, en op callsign als die ontbreekt of anders is
+    for name in (data.get("robloxName"), data.get("callsign")):
+        if name:
+            traffic_pilots[traffic_name(name)] = (expires, info)
+
+    refresh_ingest_types()
+
+
+def update_traffic(data):
+    if not isinstance(data, dict):
+        return
+
+    global traffic_errors
+
+    now = time.monotonic()
+
+    for callsign, aircraft in data.items():
+        # Eén kapot aircraft (geen dict, positie geen getal) mag de websocket niet laten reconnecten
+        try:
+            pilot = traffic_pilots.get(traffic_name(aircraft.get("playerName", ""))) or traffic_pilots.get(traffic_name(callsign))
+            if pilot is None:
+                continue
+
+            position = aircraft.get("position") or {}
+            traffic_store.update(
+                callsign,
+                float(position.get("x") or 0),
+                float(position.get("y") or 0),
+                float(aircraft.get("altitude") or 0),
+                float(aircraft.get("speed") or 0),
+                float(aircraft.get("heading") or 0),
+                bool(aircraft.get("isOnGround")),
+                now,
+                pilot[1]
+            )
+        except (AttributeError, TypeError, ValueError):
+            traffic_errors += 1
+
+
+def build_traffic_embed():
+    airborne = traffic_store.airborne()
+
+    # Dichtstbijzijnde airport via het grid, alleen de cellen rond elk airport
+    near_airport = {}
+    for airport, (x, y) in AIRPORT_POSITIONS.items():
+        for slot in traffic_store.near(x, y, TRAFFIC_NEAR_RADIUS):
+            near_airport.setdefault(slot, airport)
+
+    lines = []
+    for slot in sorted(airborne, key=lambda slot: traffic_store.names[slot])[:TRAFFIC_EMBED_MAX]:
+        info = traffic_store.info[slot]
+
+        # Afronden zodat kleine veranderingen geen edit geven
+        line = (
+            f"**{info['callsign'] or traffic_store.names[slot]}** {info['aircraft'] or ''} "
+            f"{info['departing'] or '?'} → {info['arriving'] or '?'} · "
+            f"{int(traffic_store.altitude[slot] // 500 * 500)} ft · {int(traffic_store.speed[slot] // 10 * 10)} kt"
+        )
+        if slot in near_airport:
+            line += f" · near {near_airport[slot]}"
+        lines.append(line)
+
+    embed = discord.Embed(
+        title=f"✈️ {VA_DISPLAY} flights airborne",
+        description="\n".join(lines) or f"No {VA_DISPLAY} flights airborne right now.",
+        color=0x00A1E4
+    )
+    embed.set_footer(text=f"{len(airborne)} airborne")
+
+    return embed
+
+
+async def traffic_status_updater():
+    while True:
+        await asyncio.sleep(TRAFFIC_EMBED_INTERVAL)
+
+        now = time.monotonic()
+        traffic_store.expire(now, TRAFFIC_TIMEOUT)
+
+        for name, (expires, _) in list(traffic_pilots.items()):
+            if expires < now:
+                del traffic_pilots[name]
+
+        refresh_ingest_types()
+
+        if not BOT_ACTIVE:
+            continue
+
+        # Ook als alles weg is renderen: de laatste edit zet "No ... flights airborne" neer.
+        # Ongewijzigd embed -> upsert_route_message slaat de edit over.
+        embed = build_traffic_embed()
+        embed_hash = embed_content_hash(embed)
+
+        await fan_out(
+            [upsert_route_message(channel, "traffic", embed, embed_hash) for channel, _ in subscribed_channels("route")],
+            "update traffic status"
+        )
+
+
+# Dedup van flight plans: LRU met TTL. Volgorde in de dict = volgorde van verlopen.
+fpl_seen = collections.OrderedDict()
+fpl_duplicates = 0
+
+def flight_plan_key(data, cleaned_route):
+    return (
+        str(data.get("callsign") or "").upper().strip(),
+        " ".join(cleaned_route.upper().split()),
+        str(data.get("departing") or "").upper().strip(),
+        str(data.get("arriving") or "").upper().strip()
+    )
+
+
+def find_duplicate_flight_plan(key):
+    now = time.monotonic()
+
+    # Verlopen entries vooraan opruimen
+    while fpl_seen:
+        oldest_key, (expires, _) = next(iter(fpl_seen.items()))
+        if expires > now:
+            break
+        del fpl_seen[oldest_key]
+
+    entry = fpl_seen.get(key)
+    if entry is None:
+        return None
+
+    # Opnieuw ingediend -> TTL verlengen
+    fpl_seen[key] = (now + FPL_DEDUP_TTL, entry[1])
+    fpl_seen.move_to_end(key)
+    return entry[1]
+
+
+def remember_flight_plan(key, announcement):
+    fpl_seen[key] = (time.monotonic() + FPL_DEDUP_TTL, announcement)
+
+    if len(fpl_seen) > FPL_DEDUP_MAX:
+        fpl_seen.popitem(last=False)
+
+
+async def handle_duplicate_flight_plan(announcement, embed):
+    global fpl_duplicates
+
+    fpl_duplicates += 1
+
+    if FPL_DEDUP_MODE != "edit":
+        return
+
+    announcement["embed"] = embed
+
+    # Nog niet verstuurd -> de batcher pakt vanzelf de nieuwe embed
+    if announcement["messages"] is None:
+        return
+
+    embeds = announcement["embeds"]
+    embeds[announcement["index"]] = embed
+
+    await fan_out(
+        [
+            deliver(channel, "edit", lambda message=message: message.edit(embeds=embeds))
+            for channel, message in announcement["messages"]
+        ],
+        "edit flight plan announcement"
+    )
+
+
+# FPL aankondigingen bundelen, per VA een eigen batch en batcher
+fpl_pending = {}
+fpl_batch_tasks = {}
+
+def announce_flight_plan(announcement):
+    name = announcement["tenant"]["name"]
+
+    fpl_pending.setdefault(name, []).append(announcement)
+
+    # Rustig -> batcher stuurt meteen, druk -> verzamelen tot het window voorbij is
+    if name not in fpl_batch_tasks:
+        fpl_batch_tasks[name] = asyncio.create_task(fpl_batcher(announcement["tenant"]))
+
+
+async def fpl_batcher(tenant):
+    pending = fpl_pending[tenant["name"]]
+
+    try:
+        while pending:
+            await send_flight_plan_batch(tenant, pending)
+            await asyncio.sleep(FPL_BATCH_WINDOW)
+    finally:
+        del fpl_batch_tasks[tenant["name"]]
+
+
+# Kanalen voor een VA: eigen kanaal, anders alle "fpl" abonnementen. Geeft (kanaal, ping role).
+def flight_plan_channels(tenant):
+    if tenant.get("channel"):
+        channel = client.get_channel(tenant["channel"])
+        if channel is None:
+            print(f"Channel not found for {tenant['name']}!")
+            return []
+        return [(channel, tenant.get("role") or ROLE_ID)]
+
+    return [(channel, subscription.get("role")) for channel, subscription in subscribed_channels("fpl")]
+
+
+async def send_to_channel(channel, content, embeds):
+    return channel, await deliver(channel, "send", lambda: channel.send(content=content, embeds=embeds))
+
+
+async def send_flight_plan_batch(tenant, pending):
+    channels = flight_plan_channels(tenant)
+    if not channels:
+        pending.clear()
+        return
+
+    batch_size = min(FPL_BATCH_SIZE, 10)
+    contents = {channel.id: f"<@&{role}>" if role else None for channel, role in channels}
+
+    while pending:
+        batch = pending[:batch_size]
+        del pending[:batch_size]
+
+        embeds = [announcement["embed"] for announcement in batch]
+
+        # Zelfde embeds naar alle kanalen tegelijk, elk kanaal via zijn eigen lane
+        messages = await fan_out(
+            [send_to_channel(channel, contents[channel.id], embeds) for channel, _ in channels],
+            f"send {len(embeds)} flight plans"
+        )
+        if not messages:
+            continue
+
+        sent_at = time.perf_counter()
+
+        # Bewaren waar elke aankondiging staat, zodat "edit" dedup hem kan bijwerken
+        for index, announcement in enumerate(batch):
+            announcement["messages"] = messages
+            announcement["embeds"] = embeds
+            announcement["index"] = index
+
+            if announcement["received"]:
+                END_TO_END_SECONDS.observe(sent_at - announcement["received"], event="FLIGHT_PLAN")
+
+        # Maar één ping per batch
+        for channel, _ in messages:
+            contents[channel.id] = None
+
+
+# Begrensde queue: de websocket zet events erin, workers doen het Discord werk
+class EventQueue:
+    def __init__(self, maxsize, policy):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = collections.deque()
+        self.changed = asyncio.Condition()
+        self.dropped = 0
+
+    def depth(self):
+        return len(self.items)
+
+    def drop_oldest_atis(self):
+        for index, (event_type, data, version, received) in enumerate(self.items):
+            if event_type == "ATIS":
+                del self.items[index]
+                self.dropped += 1
+                print(f"Event queue full ({self.depth()}), dropped ATIS for {data.get('airport')}")
+                forget_atis_snapshot()
+                return True
+        return False
+
+    async def put(self, event_type, data, version=None, received=None):
+        async with self.changed:
+            while len(self.items) >= self.maxsize:
+                # Geen ATIS meer om weg te gooien -> wachten (FPL nooit weggooien)
+                if self.policy == "drop_atis" and self.drop_oldest_atis():
+                    break
+                await self.changed.wait()
+
+            self.items.append((event_type, data, version, received))
+            self.changed.notify_all()
+
+    async def get(self):
+        async with self.changed:
+            while not self.items:
+                await self.changed.wait()
+
+            item = self.items.popleft()
+            self.changed.notify_all()
+            return item
+
+
+event_queue = EventQueue(EVENT_QUEUE_SIZE, EVENT_QUEUE_POLICY)
+background_tasks = []
+
+
+# worker: events uit de queue afhandelen
+async def event_worker():
+    while True:
+        event_type, data, version, received = await event_queue.get()
+
+        started = time.perf_counter()
+        if received:
+            STAGE_SECONDS.observe(started - received, stage="queue")
+
+        try:
+            if event_type in ["FLIGHT_PLAN", "EVENT_FLIGHT_PLAN"]:
+                await handle_flight_plan(data, event_type, received)
+
+            elif event_type == "ATIS":
+                await handle_atis(data, version, received)
+
+        except Exception as e:
+            print(f"Event worker error ({event_type}): {e}")
+
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="handle")
+
+
+def start_background_tasks():
+    # on_ready kan vaker afgaan (reconnect), taken maar één keer starten
+    if background_tasks:
+        return
+
+    for _ in range(EVENT_WORKERS):
+        background_tasks.append(client.loop.create_task(event_worker()))
+
+    background_tasks.append(client.loop.create_task(frame_stats_reporter()))
+    background_tasks.append(client.loop.create_task(routes_watcher()))
+    background_tasks.append(client.loop.create_task(websocket_listener()))
+    background_tasks.append(client.loop.create_task(atis_reconciler()))
+    background_tasks.append(client.loop.create_task(start_metrics_server()))
+    background_tasks.append(client.loop.create_task(traffic_status_updater()))
+
+
+# Frame pre-filter: event type uit de ruwe tekst lezen zonder de hele payload te parsen
+FRAME_TYPE_PATTERN = re.compile(r'\s*\{\s*"t"\s*:\s*"([A-Za-z_]+)"')
+
+frames_parsed = collections.Counter()
+frames_skipped = collections.Counter()
+frame_cpu_time = 0.0
+
+
+# Aircraft data alleen parsen als er KLMVA piloten zijn om te volgen
+def wanted_event(event_type):
+    return event_type in HANDLED_EVENTS or (event_type in TRAFFIC_EVENTS and bool(traffic_pilots))
+
+
+def decode_frame(message):
+    global frame_cpu_time
+
+    start = time.thread_time()
+
+    if isinstance(message, bytes):
+        message = message.decode()
+
+    try:
+        # "t" staat vooraan in het frame; zo niet dan gewoon volledig parsen
+        match = FRAME_TYPE_PATTERN.match(message)
+        if match and not wanted_event(match.group(1)):
+            frames_skipped[match.group(1)] += 1
+            return None
+
+        payload = json_loads(message)
+        event_type = payload.get("t")
+
+        if not wanted_event(event_type):
+            frames_skipped[event_type] += 1
+            return None
+
+        frames_parsed[event_type] += 1
+        return event_type, payload.get("d")
+
+    finally:
+        frame_cpu_time += time.thread_time() - start
+
+
+# frame statistieken loggen
+async def frame_stats_reporter():
+    while True:
+        await asyncio.sleep(FRAME_STATS_INTERVAL)
+
+        total = sum(frames_parsed.values()) + sum(frames_skipped.values())
+        if not total:
+            continue
+
+        print(
+            f"Frames: {total}, CPU per frame {frame_cpu_time / total * 1e6:.1f}µs, "
+            f"parsed {dict(frames_parsed)}, skipped {dict(frames_skipped)}, "
+            f"queue depth {event_queue.depth()}, duplicate flight plans suppressed {fpl_duplicates}, "
+            f"malformed aircraft skipped {traffic_errors}"
+        )
+
+
+# Hub: alleen de events die we afhandelen, ATIS stand als één snapshot frame.
+# Aircraft data alleen zolang er KLMVA piloten zijn om te volgen.
+ingest_websocket = None
+ingest_subscribed = None
+
+def ingest_types():
+    return sorted(HANDLED_EVENTS | TRAFFIC_EVENTS if traffic_pilots else HANDLED_EVENTS)
+
+
+def ingest_url():
+    global ingest_subscribed
+
+    if not INGEST_HUB_URL:
+        return WSS_URL
+
+    ingest_subscribed = ingest_types()
+    return f"{INGEST_HUB_URL.rstrip('/')}/?types={','.join(ingest_subscribed)}"
+
+
+# Piloten erbij of allemaal verlopen -> types bij de hub aanpassen, zonder opnieuw te verbinden
+def refresh_ingest_types():
+    global ingest_subscribed
+
+    if ingest_websocket is None or ingest_subscribed == ingest_types():
+        return
+
+    ingest_subscribed = ingest_types()
+    client.loop.create_task(send_ingest_types(ingest_websocket, ingest_subscribed))
+
+
+async def send_ingest_types(websocket, types):
+    try:
+        await websocket.send(json.dumps({"types": types}))
+    except websockets.ConnectionClosed:
+        pass
+
+
+# connectie naar websocket (supervisor met backoff)
+async def websocket_listener():
+    global ingest_websocket
+
+    await client.wait_until_ready()
+
+    delay = RECONNECT_MIN_DELAY
+
+    while not client.is_closed():
+        try:
+            async with websockets.connect(ingest_url(), origin=None) as websocket:
+                print(f"Connected to {'ingest hub' if INGEST_HUB_URL else '24data WebSocket'}")
+
+                if INGEST_HUB_URL:
+                    ingest_websocket = websocket
+
+                # ATIS gemist tijdens de disconnect -> meteen via REST bijwerken (de hub stuurt zelf een snapshot)
+                if not INGEST_HUB_URL:
+                    client.loop.create_task(resync_atis(force=True))
+
+                async for message in websocket:
+                    # Verbinding werkt weer, backoff resetten
+                    delay = RECONNECT_MIN_DELAY
+
+                    received = time.perf_counter()
+                    event = decode_frame(message)
+                    STAGE_SECONDS.observe(time.perf_counter() - received, stage="decode")
+
+                    if event:
+                        event_type, data = event
+
+                        # Posities direct bijwerken, geen Discord werk dus niet via de queue
+                        if event_type in TRAFFIC_EVENTS:
+                            update_traffic(data)
+                            continue
+
+                        if event_type == "ATIS_SNAPSHOT":
+                            client.loop.create_task(apply_atis_snapshot(data or [], next_atis_version()))
+                            continue
+
+                        version = next_atis_version() if event_type == "ATIS" else None
+                        await event_queue.put(event_type, data, version, received)
+
+        except Exception as e:
+            print(f"WebSocket error: {e}")
+
+        ingest_websocket = None
+        RECONNECTS_TOTAL.inc()
+
+        wait = random.uniform(delay / 2, delay)
+        print(f"Reconnecting in {wait:.1f} seconds...")
+        await asyncio.sleep(wait)
+
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+# Kanaal leegmaken met bulk delete, oude berichten los en rustig verwijderen
+async def purge_channel(channel, check=lambda message: True):
+    started = time.monotonic()
+    started_at = discord.utils.utcnow()
+    # Marge van een uur zodat een bericht niet net tijdens de purge te oud wordt
+    bulk_cutoff = started_at - datetime.timedelta(days=14) + datetime.timedelta(hours=1)
+
+    batch = []
+    old_messages = []
+    deleted = 0
+
+    def timed_out():
+        return time.monotonic() - started > PURGE_TIMEOUT
+
+    async for message in channel.history(limit=None):
+        if timed_out():
+            break
+
+        # Berichten die tijdens de purge gepost zijn laten staan
+        if message.created_at >= started_at or not check(message):
+            continue
+
+        if message.created_at < bulk_cutoff:
+            old_messages.append(message)
+            continue
+
+        batch.append(message)
+        if len(batch) >= PURGE_BATCH_SIZE:
+            await channel.delete_messages(batch)
+            deleted += len(batch)
+            batch = []
+            print(f"Purge #{channel}: {deleted} messages deleted")
+
+    if batch and not timed_out():
+        await channel.delete_messages(batch)
+        deleted += len(batch)
+
+    for message in old_messages:
+        if timed_out():
+            break
+
+        try:
+            await message.delete()
+            deleted += 1
+        except discord.NotFound:
+            pass
+
+        await asyncio.sleep(PURGE_OLD_DELAY)
+
+    if timed_out():
+        print(f"Purge #{channel} stopped after {PURGE_TIMEOUT}s")
+
+    print(f"Purge #{channel} done: {deleted} messages deleted in {time.monotonic() - started:.1f}s")
+    return deleted
+
+
+# /route: command + embed voor een route, standaard met de actieve ATIS banen
+def route_response(dep_airport, dep_runway, arr_airport, arr_runway):
+    key = (dep_airport, dep_runway, arr_airport, arr_runway)
+
+    config = get_route_config(*key)
+    if config:
+        return config
+
+    # Geen route bekend -> kaal command, onthouden in de render cache
+    if key in route_response_cache:
+        route_response_cache.move_to_end(key)
+        return route_response_cache[key]
+
+    entry = route_response_cache[key] = build_route_entry(*key, "", "")
+    if len(route_response_cache) > ROUTE_RESPONSE_CACHE_SIZE:
+        route_response_cache.popitem(last=False)
+
+    return entry
+
+
+@tree.command(
+    name="route",
+    description="Get the flight plan command for a route",
+    guild=discord.Object(id=SERVER_ID)
+)
+@app_commands.describe(
+    dep="Departure airport",
+    arr="Arrival airport",
+    dep_rwy="Departure runway (default: active ATIS runway)",
+    arr_rwy="Arrival runway (default: active ATIS runway)"
+)
+async def route_command(
+    interaction: discord.Interaction,
+    dep: str,
+    arr: str,
+    dep_rwy: str = None,
+    arr_rwy: str = None
+):
+    dep = dep.strip().upper()
+    arr = arr.strip().upper()
+    dep_rwy = (dep_rwy or atis_dep_runways.get(dep) or "").strip()
+    arr_rwy = (arr_rwy or atis_arr_runways.get(arr) or "").strip()
+
+    if not dep_rwy or not arr_rwy:
+        await interaction.response.send_message(
+            f"No active runway known for {dep if not dep_rwy else arr}, please pick one.",
+            ephemeral=True
+        )
+        return
+
+    # Zelfde notatie als de ATIS/routes.json keys (7 -> 07)
+    dep_rwy = normalize_runway(dep_rwy)
+    arr_rwy = normalize_runway(arr_rwy)
+
+    # Vrije tekst niet doorgeven aan de route lookup (en de caches): alleen bekende banen
+    unknown = None
+    if dep_rwy not in route_runways.get(("dep", dep), ()):
+        unknown = f"No departures known from {dep} {dep_rwy}."
+    elif arr_rwy not in route_runways.get(("arr", arr), ()):
+        unknown = f"No arrivals known into {arr} {arr_rwy}."
+
+    if unknown:
+        await interaction.response.send_message(f"{unknown} Pick an airport and runway from the list.", ephemeral=True)
+        return
+
+    entry = route_response(dep, dep_rwy, arr, arr_rwy)
+
+    content = None
+    if not entry["route"]:
+        content = f"No route known for {dep} {dep_rwy} → {arr} {arr_rwy}, this command has no route."
+
+    await interaction.response.send_message(content=content, embed=entry["embed"], ephemeral=True)
+
+
+@route_command.autocomplete("dep")
+@route_command.autocomplete("arr")
+async def airport_autocomplete(interaction: discord.Interaction, current: str):
+    return airport_choices.get(current.strip().upper(), [])
+
+
+@route_command.autocomplete("dep_rwy")
+async def dep_runway_autocomplete(interaction: discord.Interaction, current: str):
+    airport = (interaction.namespace.dep or "").strip().upper()
+    return runway_choices.get(("dep", airport), {}).get(current.strip().upper(), [])
+
+
+@route_command.autocomplete("arr_rwy")
+async def arr_runway_autocomplete(interaction: discord.Interaction, current: str):
+    airport = (interaction.namespace.arr or "").strip().upper()
+    return runway_choices.get(("arr", airport), {}).get(current.strip().upper(), [])
+
+
+def format_top(counter):
+    return "\n".join(f"{name}: {count}" for name, count in counter.most_common(FPL_STATS_TOP)) or "N/A"
+
+
+@tree.command(
+    name="fplstats",
+    description=f"{VA_DISPLAY} flight plan statistics (last {FPL_STATS_DAYS} days)",
+    guild=discord.Object(id=SERVER_ID)
+)
+async def fplstats_command(interaction: discord.Interaction):
+    today = fpl_stats_day()
+    expire_fpl_stats(today)
+
+    def count_since(days):
+        cutoff = today - datetime.timedelta(days=days)
+        return sum(counts["count"] for day, counts in fpl_stats_days.items() if day > cutoff)
+
+    embed = discord.Embed(
+        title=f"📊 {VA_DISPLAY} Flight Plans (last {FPL_STATS_DAYS} days)",
+        color=0x00A1E4
+    )
+
+    embed.add_field(name="Today", value=str(count_since(1)), inline=True)
+    embed.add_field(name="Last 7 days", value=str(count_since(7)), inline=True)
+    embed.add_field(name=f"Last {FPL_STATS_DAYS} days", value=str(fpl_stats_total["count"]), inline=True)
+    embed.add_field(name="Top routes", value=format_top(fpl_stats_total["routes"]), inline=True)
+    embed.add_field(name="Top aircraft", value=format_top(fpl_stats_total["aircraft"]), inline=True)
+    embed.add_field(name="Server", value=format_top(fpl_stats_total["servers"]), inline=True)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# check of iemand de MASTER_ROLE heeft
+def has_offline_role(interaction: discord.Interaction) -> bool:
+    return any(role.id == MASTER_ROLE for role in interaction.user.roles)
+
+
+# /offline command
+@tree.command(
+    name="offline",
+    description="Disable bot and clear route channel",
+    guild=discord.Object(id=SERVER_ID)
+)
+async def offline(interaction: discord.Interaction):
+    global BOT_ACTIVE
+
+    if not has_offline_role(interaction):
+        await interaction.response.send_message(
+            "❌ You are not allowed to use this command.",
+            ephemeral=True
+        )
+        return
+
+    BOT_ACTIVE = False
+
+    channels = [channel for channel, _ in subscribed_channels("route")]
+    if not channels:
+        await interaction.response.send_message(
+            "Route channel not found.",
+            ephemeral=True
+        )
         return
 
     await interaction.response.send_message(
@@ -366,8 +2150,13 @@ async def offline(interaction: discord.Interaction):
         ephemeral=True
     )
 
-    async for message in channel.history(limit=None):
-        await message.delete()
+    deleted = sum(await asyncio.gather(*(purge_channel(channel) for channel in channels)))
+
+    route_messages.clear()
+    route_message_hashes.clear()
+    last_send_dep_runway.clear()
+    save_route_messages()
+    state_store.clear("last_send")
 
     embed = discord.Embed(
         title="🚫 Bot currently offline",
@@ -375,26 +2164,85 @@ async def offline(interaction: discord.Interaction):
         color=0xFF0000
     )
 
-    await channel.send(embed=embed)
+    await fan_out(
+        [deliver(channel, "send", lambda channel=channel: channel.send(embed=embed)) for channel in channels],
+        "post offline notice"
+    )
+
+    await interaction.followup.send(
+        f"Cleared {deleted} messages.",
+        ephemeral=True
+    )
+
+
+
+# Slash commands alleen syncen als de definities veranderd zijn sinds de vorige run
+def command_definitions_hash(guild):
+    definitions = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            definitions.append(command.to_dict(tree))
+        except TypeError:
+            # Oudere discord.py: to_dict() zonder tree
+            definitions.append(command.to_dict())
+
+    payload = json.dumps([guild.id, definitions], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def sync_commands(guild):
+    commands_hash = command_definitions_hash(guild)
 
+    try:
+        with open(COMMAND_HASH_FILE) as f:
+            if f.read().strip() == commands_hash:
+                print("Slash commands unchanged, skipping sync")
+                return
+    except OSError:
+        pass
+
+    await tree.sync(guild=guild)
+    print("Slash commands synced (server)")
+
+    with open(COMMAND_HASH_FILE, "w") as f:
+        f.write(commands_hash)
+
+
+# Routes op de laatst bekende runways, de resync werkt ze daarna bij.
+# Pas na het seeden, dan zijn verwijderde route berichten al uit last_send gehaald.
+async def evaluate_known_routes():
+    await route_hashes_seeded.wait()
+    await log_first_route(await evaluate_routes(ROUTE_PAIRS, delay=0))
 
 
 # start programma
 @client.event
 async def on_ready():
-    print(f"Logged in as {client.user}")
+    print(f"Logged in as {client.user} ({time.monotonic() - PROCESS_START:.2f}s after process start)")
 
-    server = discord.Object(id=SERVER_ID)
-    await tree.sync(guild=server)
-    print("Slash commands synced (server)")
-    
-    channel = client.get_channel(CHANNEL_ID_ROUTE)
-    async for message in channel.history(limit=None):
-        await message.delete()
+    # Eerst de websocket + ATIS snapshot starten, de rest loopt daarnaast
+    client.loop.create_task(seed_all_route_hashes())
+
+    start_background_tasks()
+
+    await sync_commands(discord.Object(id=SERVER_ID))
+
+    # Bekende route berichten laten staan, die worden straks ge-edit.
+    # Purge loopt op de achtergrond zodat ATIS meteen kan laden.
+    for channel, _ in subscribed_channels("route"):
+        client.loop.create_task(
+            purge_channel(channel, check=lambda message: message.id not in route_messages.values())
+        )
+
+    client.loop.create_task(evaluate_known_routes())
 
-    await fetch_initial_atis()
-    client.loop.create_task(websocket_listener())
 
 
+# Alleen starten als script, zodat bench/ bot.py kan importeren
+if __name__ == "__main__":
+    warm_state()
 
-client.run(TOKEN)
\ No newline at end of file
+    try:
+        client.run(TOKEN)
+    finally:
+        state_store.close()
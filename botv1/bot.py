@@ -8,7 +8,8 @@ TOKEN = os.environ["DISCORD_TOKEN"]
 CHANNEL_ID = int(os.environ["CHANNEL_ID"])
 ROLE_ID = int(os.environ["ROLE_ID"])
 
-WSS_URL = "wss://24data.ptfs.app/wss"
+# Of via de lokale ingest hub (hub.py): ws://127.0.0.1:8765/?types=FLIGHT_PLAN,EVENT_FLIGHT_PLAN
+WSS_URL = os.environ.get("WSS_URL", "wss://24data.ptfs.app/wss")
 
 intents = discord.Intents.default()
 client = discord.Client(intents=intents)
@@ -14,6 +14,8 @@ CHANNEL_ID_FPL = [channel id of channel where FPL updates will be send]
 ROLE_ID = [id of FPL ping role]
 
 WSS_URL = "wss://24data.ptfs.app/wss"
+# Of via de lokale ingest hub (hub.py), die stuurt bij het verbinden ook de huidige ATIS:
+# WSS_URL = "ws://127.0.0.1:8765/?types=FLIGHT_PLAN,EVENT_FLIGHT_PLAN,ATIS"
 
 # Gedefieneerde routes:
 BASE_ROUTES = [
@@ -0,0 +1,327 @@
+# 24data ingest hub: één upstream websocket + ATIS snapshot voor alle lokale bots.
+#
+# Bots verbinden met ws://127.0.0.1:8765/?types=FLIGHT_PLAN,ATIS en krijgen alleen die
+# event types, in hetzelfde frame formaat als 24data ({"t": ..., "d": ...}). Zonder types
+# komt alles door. Een bot kan zijn types later aanpassen door {"types": [...]} te sturen.
+# Elk frame wordt hier één keer gedecodeerd en daarna als ruwe tekst doorgestuurd.
+#
+# Nieuwe bots krijgen meteen de huidige ATIS stand: als losse ATIS frames, of als één
+# ATIS_SNAPSHOT frame ({"t": "ATIS_SNAPSHOT", "d": [atis, ...]}) als ze daarop abonneren.
+#
+# Gebruik: python hub.py [--host 127.0.0.1] [--port 8765]
+import re
+import json
+import random
+import asyncio
+import argparse
+import collections
+from urllib.parse import urlsplit, parse_qs
+
+import aiohttp
+import websockets
+
+# Snellere JSON parser als die geïnstalleerd is
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+WSS_URL = "wss://24data.ptfs.app/wss"
+ATIS_URL = "https://24data.ptfs.app/atis"
+
+HUB_HOST = "127.0.0.1"
+HUB_PORT = 8765
+
+HTTP_TIMEOUT = 15
+ATIS_RECONCILE_INTERVAL = 60
+
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+# Frames per bot die nog niet verstuurd zijn. Loopt een bot zo ver achter, dan vallen eerst
+# traffic en ATIS frames weg (ATIS komt daarna uit de snapshot terug); past er dan nog
+# geen flight plan bij, dan wordt de bot afgesloten zodat die opnieuw verbindt.
+SUBSCRIBER_QUEUE_SIZE = 1000
+DROPPABLE_EVENTS = {"ACFT_DATA", "EVENT_ACFT_DATA", "ATIS"}
+STATS_INTERVAL = 300
+
+FRAME_TYPE_PATTERN = re.compile(r'\s*\{\s*"t"\s*:\s*"([A-Za-z_]+)"')
+
+
+# Huidige ATIS per airport: (versie, atis dict, ruw frame)
+atis_snapshot = {}
+atis_version = 0
+
+subscribers = set()
+frames_in = collections.Counter()
+frames_out = 0
+
+
+class Subscriber:
+    def __init__(self, websocket, types):
+        self.websocket = websocket
+        # None = alle event types
+        self.types = types
+        # (event type, frame), oudste eerst
+        self.frames = collections.deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        # ATIS weggegooid -> als de bot weer bij is de ATIS snapshot opnieuw sturen
+        self.atis_dropped = False
+        self.closing = False
+
+    def wants(self, event_type):
+        return self.types is None or event_type in self.types
+
+    def offer(self, event_type, frame):
+        if self.closing:
+            return
+
+        if len(self.frames) >= SUBSCRIBER_QUEUE_SIZE and not self.make_room(event_type):
+            return
+
+        self.frames.append((event_type, frame))
+        self.ready.set()
+
+    def make_room(self, event_type):
+        if event_type in DROPPABLE_EVENTS:
+            self.drop(event_type)
+            return False
+
+        # Flight plan: oudste traffic/ATIS frame eruit
+        for index, (queued_type, _) in enumerate(self.frames):
+            if queued_type in DROPPABLE_EVENTS:
+                del self.frames[index]
+                self.drop(queued_type)
+                return True
+
+        # Alleen nog flight plans in de rij -> afsluiten, de bot verbindt opnieuw en krijgt de snapshot
+        self.dropped += 1
+        self.closing = True
+        self.frames.clear()
+        print(f"Bot too far behind ({SUBSCRIBER_QUEUE_SIZE} flight plans queued), disconnecting")
+        asyncio.create_task(self.websocket.close(1013, "too far behind"))
+        return False
+
+    def drop(self, event_type):
+        self.dropped += 1
+        if event_type == "ATIS":
+            self.atis_dropped = True
+
+    async def run(self):
+        global frames_out
+
+        try:
+            while True:
+                if not self.frames:
+                    if self.atis_dropped:
+                        self.atis_dropped = False
+                        offer_atis_snapshot(self)
+                        continue
+
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+
+                _, frame = self.frames.popleft()
+                await self.websocket.send(frame)
+                frames_out += 1
+
+        except websockets.ConnectionClosed:
+            pass
+
+
+def next_atis_version():
+    global atis_version
+
+    atis_version += 1
+    return atis_version
+
+
+def broadcast(event_type, frame):
+    for subscriber in subscribers:
+        if subscriber.wants(event_type):
+            subscriber.offer(event_type, frame)
+
+
+# Huidige ATIS stand naar een bot: als losse ATIS frames of als één ATIS_SNAPSHOT frame
+def offer_atis_snapshot(subscriber):
+    if subscriber.types and "ATIS_SNAPSHOT" in subscriber.types:
+        frame = json.dumps({"t": "ATIS_SNAPSHOT", "d": [atis for _, atis, _ in atis_snapshot.values()]})
+        subscriber.offer("ATIS_SNAPSHOT", frame)
+    elif subscriber.wants("ATIS"):
+        for _, _, frame in atis_snapshot.values():
+            subscriber.offer("ATIS", frame)
+
+
+# ATIS in de snapshot zetten; alleen doorsturen als er echt iets veranderd is
+def update_atis(atis, version, frame=None):
+    airport = atis.get("airport")
+    current = atis_snapshot.get(airport)
+
+    # Oudere REST snapshot overschrijft geen nieuwere websocket ATIS
+    if current and current[0] > version:
+        return
+
+    if current and current[1] == atis:
+        atis_snapshot[airport] = (version, current[1], current[2])
+        return
+
+    frame = frame or json.dumps({"t": "ATIS", "d": atis})
+    atis_snapshot[airport] = (version, atis, frame)
+    broadcast("ATIS", frame)
+
+
+# Upstream frame één keer decoderen en naar de geïnteresseerde bots sturen
+def handle_frame(message):
+    if isinstance(message, bytes):
+        message = message.decode()
+
+    # Type uit de ruwe tekst, alleen ATIS wordt volledig geparsed
+    match = FRAME_TYPE_PATTERN.match(message)
+    if match and match.group(1) != "ATIS":
+        event_type = match.group(1)
+    else:
+        payload = json_loads(message)
+        event_type = payload.get("t")
+
+        if event_type == "ATIS":
+            frames_in[event_type] += 1
+            update_atis(payload.get("d") or {}, next_atis_version(), message)
+            return
+
+    frames_in[event_type] += 1
+    broadcast(event_type, message)
+
+
+async def resync_atis(session):
+    # Alles wat de websocket hierna ontvangt is nieuwer dan deze snapshot
+    snapshot_version = next_atis_version()
+
+    try:
+        async with session.get(ATIS_URL) as resp:
+            if resp.status != 200:
+                print("Failed to fetch ATIS:", resp.status)
+                return
+
+            data = json_loads(await resp.read())
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Failed to fetch ATIS: {e}")
+        return
+
+    for atis in data:
+        update_atis(atis, snapshot_version)
+
+    print(f"Loaded {len(data)} ATIS entries")
+
+
+async def atis_reconciler(session):
+    while True:
+        await asyncio.sleep(ATIS_RECONCILE_INTERVAL)
+        await resync_atis(session)
+
+
+# Eén upstream verbinding, met backoff + jitter zoals in bot.py
+async def upstream_listener(session):
+    delay = RECONNECT_MIN_DELAY
+
+    while True:
+        try:
+            async with websockets.connect(WSS_URL, origin=None) as websocket:
+                print("Connected to 24data WebSocket")
+
+                # ATIS gemist tijdens de disconnect -> meteen via REST bijwerken
+                asyncio.create_task(resync_atis(session))
+
+                async for message in websocket:
+                    delay = RECONNECT_MIN_DELAY
+                    handle_frame(message)
+
+        except Exception as e:
+            print(f"WebSocket error: {e}")
+
+        wait = random.uniform(delay / 2, delay)
+        print(f"Reconnecting in {wait:.1f} seconds...")
+        await asyncio.sleep(wait)
+
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+def parse_types(values):
+    types = {event_type for value in values for event_type in value.split(",") if event_type}
+    return types or None
+
+
+def request_path(websocket, path):
+    if path is not None:
+        return path
+
+    # websockets >= 13: pad zit in de request
+    request = getattr(websocket, "request", None)
+    return request.path if request is not None else websocket.path
+
+
+async def handle_subscriber(websocket, path=None):
+    query = parse_qs(urlsplit(request_path(websocket, path)).query)
+    subscriber = Subscriber(websocket, parse_types(query.get("types", [])))
+
+    # Snapshot en registratie zonder await ertussen: geen frame gaat verloren of komt dubbel
+    offer_atis_snapshot(subscriber)
+
+    subscribers.add(subscriber)
+    print(f"Bot connected ({', '.join(sorted(subscriber.types or [])) or 'all events'}), {len(subscribers)} connected")
+
+    sender = asyncio.create_task(subscriber.run())
+
+    try:
+        # Bots sturen alleen een nieuwe lijst types ({"types": [...]}), de rest negeren
+        async for message in websocket:
+            try:
+                request = json_loads(message)
+            except ValueError:
+                continue
+
+            if isinstance(request, dict) and isinstance(request.get("types"), list):
+                subscriber.types = parse_types(str(value) for value in request["types"])
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        subscribers.discard(subscriber)
+        sender.cancel()
+        print(f"Bot disconnected ({subscriber.dropped} frames dropped), {len(subscribers)} connected")
+
+
+async def stats_reporter():
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+
+        dropped = sum(subscriber.dropped for subscriber in subscribers)
+        print(
+            f"Hub: {sum(frames_in.values())} frames in {dict(frames_in)}, {frames_out} frames out, "
+            f"{len(subscribers)} bots, {len(atis_snapshot)} ATIS, {dropped} dropped"
+        )
+
+
+async def main(host, port):
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with websockets.serve(handle_subscriber, host, port):
+            print(f"Ingest hub listening on ws://{host}:{port}")
+
+            await asyncio.gather(
+                upstream_listener(session),
+                atis_reconciler(session),
+                stats_reporter()
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared 24data ingest hub for local bots")
+    parser.add_argument("--host", default=HUB_HOST)
+    parser.add_argument("--port", type=int, default=HUB_PORT)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,209 @@
+# Route engine: kortste route over een waypoint/airway graaf, van SID exit naar STAR entry.
+#
+# airways.json:
+# {
+#   "airports":  {"IRFD": [x, y]},                     (optioneel, voor afstand + vliegrichting)
+#   "waypoints": {"KUNAV": [x, y]},
+#   "airways":   [{"name": "UL1", "points": ["KUNAV", "BOBUX"], "oneway": false}],
+#   "sids":      {"IRFD": {"25L": ["KUNAV"]}},          (exit waypoints per baan)
+#   "stars":     {"IPPH": {"29": ["BOBUX"]}}            (entry waypoints per baan)
+# }
+# Coördinaten in NM op een platte kaart. "DCT" als airway naam = direct.
+import math
+import heapq
+
+# (max afstand in NM, flight level), laatste entry geldt voor alles daarboven
+FLIGHT_LEVELS = ((100, 90), (200, 170), (400, 250), (None, 330))
+
+
+class RouteEngine:
+    def __init__(self, graph=None, flight_levels=FLIGHT_LEVELS):
+        self.flight_levels = flight_levels
+        self.airports = {}
+        self.points = {}
+        self.edges = {}
+        self.neighbours = {}
+        self.sids = {}
+        self.stars = {}
+
+        # (dep, dep_rwy) -> (dist, prev): Dijkstra vanaf alle SID exits van die baan
+        self.trees = {}
+        # (dep, dep_rwy, arr, arr_rwy) -> (route, flightlevel, afstand) of None
+        self.routes = {}
+
+        self.update(graph or {})
+
+    # Graaf inlezen naar vaste structuren
+    def parse(self, graph):
+        airports = {name: tuple(xy) for name, xy in graph.get("airports", {}).items()}
+        points = {name: tuple(xy) for name, xy in graph.get("waypoints", {}).items()}
+
+        edges = {}
+        for airway in graph.get("airways", []):
+            name = airway.get("name", "DCT")
+            route_points = [point for point in airway.get("points", []) if point in points]
+
+            for a, b in zip(route_points, route_points[1:]):
+                weight = math.dist(points[a], points[b])
+                edges[(a, b)] = (weight, name)
+                if not airway.get("oneway"):
+                    edges[(b, a)] = (weight, name)
+
+        def runway_points(table):
+            return {
+                (airport, runway): tuple(point for point in entry_points if point in points)
+                for airport, runways in table.items()
+                for runway, entry_points in runways.items()
+            }
+
+        return airports, points, edges, runway_points(graph.get("sids", {})), runway_points(graph.get("stars", {}))
+
+    # Nieuwe graaf laden en alleen de gecachte bomen/routes weggooien die echt geraakt zijn
+    def update(self, graph):
+        airports, points, edges, sids, stars = self.parse(graph)
+
+        removed = [edge for edge, value in self.edges.items() if edges.get(edge, (math.inf, None)) != value]
+        improved = [(edge, value[0]) for edge, value in edges.items() if value[0] < self.edges.get(edge, (math.inf,))[0]]
+        moved_airports = {
+            airport for airport in set(airports) | set(self.airports)
+            if airports.get(airport) != self.airports.get(airport)
+        }
+
+        stale_trees = set()
+        for key, (dist, prev) in self.trees.items():
+            if (
+                key[0] in moved_airports
+                or sids.get(key) != self.sids.get(key)
+                # Gebruikte edge weg/langer/andere airway
+                or any(prev.get(b) == a for a, b in removed)
+                # Nieuwe/kortere edge geeft een kortere weg
+                or any(dist.get(a, math.inf) + weight < dist.get(b, math.inf) for (a, b), weight in improved)
+            ):
+                stale_trees.add(key)
+
+        changed_stars = {key for key in set(stars) | set(self.stars) if stars.get(key) != self.stars.get(key)}
+
+        for key in stale_trees:
+            del self.trees[key]
+
+        for key in list(self.routes):
+            dep, dep_runway, arr, arr_runway = key
+            if (
+                (dep, dep_runway) in stale_trees
+                or (dep, dep_runway) not in self.trees
+                or (arr, arr_runway) in changed_stars
+                or arr in moved_airports
+            ):
+                del self.routes[key]
+
+        self.airports, self.points, self.edges, self.sids, self.stars = airports, points, edges, sids, stars
+
+        self.neighbours = {}
+        for (a, b), (weight, name) in edges.items():
+            self.neighbours.setdefault(a, []).append((b, weight, name))
+
+        return len(stale_trees)
+
+    def airport_distance(self, airport, point):
+        if airport in self.airports and point in self.points:
+            return math.dist(self.airports[airport], self.points[point])
+        return 0.0
+
+    # Dijkstra vanaf alle SID exits tegelijk, één keer per vertrekbaan
+    def tree(self, dep, dep_runway):
+        key = (dep, dep_runway)
+        if key in self.trees:
+            return self.trees[key]
+
+        # Onbekende baan: niks cachen, anders groeit de cache met elke typfout
+        if key not in self.sids:
+            return {}, {}
+
+        dist = {}
+        prev = {}
+        queue = []
+        for point in self.sids.get(key, ()):
+            start = self.airport_distance(dep, point)
+            if start < dist.get(point, math.inf):
+                dist[point] = start
+                prev[point] = None
+                heapq.heappush(queue, (start, point))
+
+        while queue:
+            current, point = heapq.heappop(queue)
+            if current > dist[point]:
+                continue
+
+            for neighbour, weight, _ in self.neighbours.get(point, ()):
+                candidate = current + weight
+                if candidate < dist.get(neighbour, math.inf):
+                    dist[neighbour] = candidate
+                    prev[neighbour] = point
+                    heapq.heappush(queue, (candidate, neighbour))
+
+        self.trees[key] = (dist, prev)
+        return self.trees[key]
+
+    def route(self, dep, dep_runway, arr, arr_runway):
+        key = (dep, dep_runway, arr, arr_runway)
+        if key in self.routes:
+            return self.routes[key]
+
+        if (dep, dep_runway) not in self.sids or (arr, arr_runway) not in self.stars:
+            return None
+
+        dist, prev = self.tree(dep, dep_runway)
+
+        best = None
+        for point in self.stars.get((arr, arr_runway), ()):
+            if point in dist:
+                total = dist[point] + self.airport_distance(arr, point)
+                if best is None or total < best[0]:
+                    best = (total, point)
+
+        result = None
+        if best:
+            path = [best[1]]
+            while prev[path[-1]] is not None:
+                path.append(prev[path[-1]])
+            path.reverse()
+
+            result = (self.render(path), self.flight_level(dep, arr, best[0]), round(best[0]))
+
+        self.routes[key] = result
+        return result
+
+    # "A UL1 C DCT D": opeenvolgende stukken over dezelfde airway samenvoegen
+    def render(self, path):
+        parts = [path[0]]
+        current_airway = None
+
+        for a, b in zip(path, path[1:]):
+            airway = self.edges[(a, b)][1]
+            if airway == current_airway and airway != "DCT":
+                parts[-1] = b
+            else:
+                parts.extend([airway, b])
+                current_airway = airway
+
+        return " ".join(parts)
+
+    # Flight level op afstand, oostwaarts oneven / westwaarts even (semicircular rule)
+    def flight_level(self, dep, arr, distance):
+        for max_distance, level in self.flight_levels:
+            if max_distance is None or distance <= max_distance:
+                break
+
+        if dep in self.airports and arr in self.airports:
+            (x1, y1), (x2, y2) = self.airports[dep], self.airports[arr]
+            eastbound = math.degrees(math.atan2(x2 - x1, y2 - y1)) % 360 < 180
+            if (level // 10) % 2 != (1 if eastbound else 0):
+                level += 10
+
+        return f"{level:03d}"
+
+    # Alle airport paren waarvoor de graaf een SID en STAR heeft
+    def pairs(self):
+        departures = sorted({airport for airport, _ in self.sids})
+        arrivals = sorted({airport for airport, _ in self.stars})
+        return [(dep, arr) for dep in departures for arr in arrivals if dep != arr]
@@ -0,0 +1,163 @@
+# Lokale state in SQLite (WAL). Schrijven gaat gebundeld via een achtergrond thread,
+# zodat de asyncio loop nooit op de disk hoeft te wachten.
+import json
+import time
+import sqlite3
+import threading
+
+
+class StateStore:
+    # flight_plan_retention: flight plans ouder dan zoveel seconden worden opgeruimd (None = bewaren)
+    def __init__(self, path, flush_interval=1.0, flight_plan_retention=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flight_plan_retention = flight_plan_retention
+        self.connection = None
+        self.thread = None
+        self.closed = False
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+        # Nog te schrijven: (namespace, key) -> json waarde, None = verwijderen
+        self.pending = {}
+        self.cleared = set()
+        self.flight_plans = []
+
+    # Database openen, alles in één keer inlezen en daarna de writer thread starten.
+    # Met flight_plans_since komen ook de flight plans vanaf dat tijdstip mee (oudste eerst).
+    def open(self, flight_plans_since=None):
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS flight_plans ("
+            "id INTEGER PRIMARY KEY, received REAL NOT NULL, event_type TEXT, "
+            "callsign TEXT, aircraft TEXT, departing TEXT, arriving TEXT, data TEXT)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS flight_plans_received ON flight_plans (received)")
+        self.prune_flight_plans()
+        self.connection.commit()
+
+        state = {}
+        for namespace, key, value in self.connection.execute("SELECT namespace, key, value FROM state"):
+            state.setdefault(namespace, {})[key] = json.loads(value)
+
+        if flight_plans_since is not None:
+            state["flight_plans"] = self.connection.execute(
+                "SELECT received, event_type, aircraft, departing, arriving FROM flight_plans "
+                "WHERE received >= ? ORDER BY received",
+                (flight_plans_since,)
+            ).fetchall()
+
+        self.thread = threading.Thread(target=self.run, name="state-store", daemon=True)
+        self.thread.start()
+
+        return state
+
+    # Schrijfacties worden alleen gebufferd; niet geopend (bench, imports) = niks opslaan
+    def set(self, namespace, key, value):
+        if self.connection is None:
+            return
+
+        with self.lock:
+            self.pending[(namespace, str(key))] = json.dumps(value)
+
+    def delete(self, namespace, key):
+        if self.connection is None:
+            return
+
+        with self.lock:
+            self.pending[(namespace, str(key))] = None
+
+    def clear(self, namespace):
+        if self.connection is None:
+            return
+
+        with self.lock:
+            self.pending = {key: value for key, value in self.pending.items() if key[0] != namespace}
+            self.cleared.add(namespace)
+
+    def replace(self, namespace, values):
+        self.clear(namespace)
+        for key, value in values.items():
+            self.set(namespace, key, value)
+
+    def add_flight_plan(self, event_type, data, received=None):
+        if self.connection is None:
+            return
+
+        row = (
+            received or time.time(),
+            event_type,
+            data.get("callsign"),
+            data.get("aircraft"),
+            data.get("departing"),
+            data.get("arriving"),
+            json.dumps(data)
+        )
+
+        with self.lock:
+            self.flight_plans.append(row)
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    # Alles wat sinds de vorige flush binnenkwam in één transactie wegschrijven
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            cleared, self.cleared = self.cleared, set()
+            flight_plans, self.flight_plans = self.flight_plans, []
+
+        if not (pending or cleared or flight_plans):
+            return
+
+        try:
+            with self.connection:
+                for namespace in cleared:
+                    self.connection.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+                    [(namespace, key, value) for (namespace, key), value in pending.items() if value is not None]
+                )
+                self.connection.executemany(
+                    "DELETE FROM state WHERE namespace = ? AND key = ?",
+                    [key for key, value in pending.items() if value is None]
+                )
+                self.connection.executemany(
+                    "INSERT INTO flight_plans (received, event_type, callsign, aircraft, departing, arriving, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    flight_plans
+                )
+
+                if flight_plans:
+                    self.prune_flight_plans()
+        except sqlite3.Error as e:
+            print(f"State store write failed: {e}")
+
+    def prune_flight_plans(self):
+        if self.flight_plan_retention is not None:
+            self.connection.execute(
+                "DELETE FROM flight_plans WHERE received < ?", (time.time() - self.flight_plan_retention,)
+            )
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        self.connection.close()
+        self.connection = None
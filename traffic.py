@@ -0,0 +1,107 @@
+# Compacte opslag voor live posities van eigen VA verkeer.
+# Vaste slots in arrays (geheugen groeit niet mee met de server populatie)
+# plus een grof grid voor "wie is er bij airport X" queries.
+import math
+from array import array
+
+
+class TrafficStore:
+    def __init__(self, capacity=256, cell_size=5000.0):
+        self.capacity = capacity
+        self.cell_size = cell_size
+
+        self.names = [None] * capacity
+        self.info = [None] * capacity
+        self.x = array("d", [0.0]) * capacity
+        self.y = array("d", [0.0]) * capacity
+        self.altitude = array("f", [0.0]) * capacity
+        self.speed = array("f", [0.0]) * capacity
+        self.heading = array("f", [0.0]) * capacity
+        self.on_ground = array("b", [1]) * capacity
+        self.last_seen = array("d", [0.0]) * capacity
+        self.cell_of = [None] * capacity
+
+        self.slots = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def update(self, name, x, y, altitude, speed, heading, on_ground, now, info=None):
+        slot = self.slots.get(name)
+
+        if slot is None:
+            # Vol -> niet bijhouden, liever dat dan onbegrensd groeien
+            if not self.free:
+                return False
+
+            slot = self.free.pop()
+            self.slots[name] = slot
+            self.names[slot] = name
+
+        if info is not None:
+            self.info[slot] = info
+
+        self.x[slot] = x
+        self.y[slot] = y
+        self.altitude[slot] = altitude
+        self.speed[slot] = speed
+        self.heading[slot] = heading
+        self.on_ground[slot] = 1 if on_ground else 0
+        self.last_seen[slot] = now
+
+        cell = self.cell(x, y)
+        if cell != self.cell_of[slot]:
+            self.leave_cell(slot)
+            self.cells.setdefault(cell, set()).add(slot)
+            self.cell_of[slot] = cell
+
+        return True
+
+    def remove(self, name):
+        slot = self.slots.pop(name, None)
+        if slot is None:
+            return
+
+        self.leave_cell(slot)
+
+        self.names[slot] = None
+        self.info[slot] = None
+        self.cell_of[slot] = None
+        self.free.append(slot)
+
+    # Lege cellen meteen weg, anders blijft elke ooit bezochte cel in de dict staan
+    def leave_cell(self, slot):
+        cell = self.cell_of[slot]
+        if cell is None:
+            return
+
+        self.cells[cell].discard(slot)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def expire(self, now, timeout):
+        expired = [name for name, slot in self.slots.items() if now - self.last_seen[slot] > timeout]
+        for name in expired:
+            self.remove(name)
+        return expired
+
+    # Slots binnen radius van (x, y), alleen de grid cellen rond het punt bekijken
+    def near(self, x, y, radius):
+        min_x, min_y = self.cell(x - radius, y - radius)
+        max_x, max_y = self.cell(x + radius, y + radius)
+
+        found = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                for slot in self.cells.get((cell_x, cell_y), ()):
+                    if math.hypot(self.x[slot] - x, self.y[slot] - y) <= radius:
+                        found.append(slot)
+        return found
+
+    def airborne(self):
+        return [slot for slot in self.slots.values() if not self.on_ground[slot]]